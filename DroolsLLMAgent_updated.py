@@ -6,14 +6,212 @@ for intent detection and tool orchestration through function calling.
 """
 
 import os
-import json
-from openai import OpenAI
+import orjson
+import time
+import re
+import asyncio
+import copy
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType, SimpleNamespace
+import fastjsonschema
+import numpy as np
 from logger_utils import logger, log_operation, log_decorator
 from tools.rule_management.add import add_rule
 from tools.rule_management.edit import edit_rule
 from tools.rule_management.delete import delete_rule
-from tools.rule_management.search import search_rules
-from utils.parse_java_classes import parse_java_classes
+from tools.rule_management.search import (
+    SEARCH_RESULT_CACHE_TTL,
+    get_embeddings,
+    get_search_result_generation,
+    search_rules,
+    search_rules_async,
+)
+from utils.parse_java_classes import format_java_classes, parse_java_classes
+from utils.openai_client import (
+    describe_openai_error,
+    get_async_openai_client,
+    get_openai_client,
+    get_request_semaphore,
+    log_prompt_cache_usage,
+)
+from utils.settings import get_settings
+
+
+# The system prompt and function schemas are invariant across agents and turns,
+# so they are built once at import time and shared by every instance.
+SYSTEM_PROMPT = """
+        You are a Drools rule assistant that helps users create, search, edit, and delete Drools rules in a natural, conversational way. 
+        
+        **CRITICAL RULE: Always speak in plain NL and don't expose Java class or method names.
+        E.g "total expected sales" instead of totalExpectedSales**
+        
+        General guidelines:
+        - Call validate_user_input in case of add, edit intents to validate the request and receive the refined user intent in natural language before proceeding with rule creation or editing using the refined user intent.
+        - If user intent is to search, find, or list rules, call the search_rules function passing the user's query as input.
+        - If user sends a delete command and provided the rule name to delete, follow below steps:
+            1. Call search_rules function passing the user's query as input.
+            2. Show the matching rule details back to the user in natural language. 
+            3. Ask user for confirmation to delete the rule.
+            4. Only after confirming with user to proceed with the action, call the delete_rule function.
+        - If user sends a delete command, and the user provided a description of the rule to delete **or** didn't provide the exact rule name, follow the below steps:
+            1. Call search_rules function passing the user's query as input.
+            2. Show the matching rule names with brief description back to the user in natural language.
+            3. Once they pick a single rule, ask user for confirmation to delete the rule. 
+            4. Only after confirming with user to proceed with the action, call the delete_rule function.
+        - Maintain conversational, helpful tone throughout.
+        
+        Always respond in a helpful, conversational manner.
+        """
+
+FUNCTION_DEFINITIONS = [
+    {
+        "name": "validate_user_input",
+        "description": "Validate user input based on intent before executing add, or edit operations",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "user_input": {
+                    "type": "string",
+                    "description": "The user's input to validate",
+                },
+                "intent": {
+                    "type": "string",
+                    "description": "The detected intent (add, edit)",
+                }
+            },
+            "required": ["user_input", "intent"],
+        },
+    },
+    {
+        "name": "add_rule",
+        "description": "Create a new Drools rule from natural language description (only call after validation passes)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "description": {
+                    "type": "string",
+                    "description": "Natural language description of the rule",
+                }
+            },
+            "required": ["description"],
+        },
+    },
+    {
+        "name": "edit_rule",
+        "description": "Modify an existing Drools rule (only call after validation passes)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "rule_name": {
+                    "type": "string",
+                    "description": "Name of the rule to edit",
+                },
+                "changes": {
+                    "type": "string",
+                    "description": "Natural language description of the changes to make",
+                },
+            },
+            "required": ["rule_name", "changes"],
+        },
+    },
+    {
+        "name": "delete_rule",
+        "description": "Move a rule to the deleted_rules directory (only call after validation passes)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "rule_name": {
+                    "type": "string",
+                    "description": "Name or description of the rule to move. The system will search for the best match.",
+                }
+            },
+            "required": ["rule_name"],
+        },
+    },
+    {
+        "name": "search_rules",
+        "description": "Search for Drools rules based on natural language query (only call after validation passes)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Natural language search query to find similar rules",
+                }
+            },
+            "required": ["query"],
+        },
+    },
+]
+
+# The same schemas in the tools format expected by the chat completions API
+TOOL_DEFINITIONS = [
+    {"type": "function", "function": definition} for definition in FUNCTION_DEFINITIONS
+]
+
+# Argument validators generated once from the schemas above
+ARGUMENT_VALIDATORS = {
+    definition["name"]: fastjsonschema.compile(definition["parameters"])
+    for definition in FUNCTION_DEFINITIONS
+}
+
+# Validation prompts only depend on the intent and the Java class map, so
+# they are shared by every agent loaded with the same classes
+_VALIDATION_PROMPT_CACHE = {}
+_VALIDATION_PROMPT_CACHE_LOCK = threading.Lock()
+
+# Replies to conversational turns that called no tools ("hi", "what can you
+# do?"), keyed by a hash of the full conversation so far plus the new message
+REPLY_CACHE_SIZE = 256
+_REPLY_CACHE = OrderedDict()
+_REPLY_CACHE_LOCK = threading.Lock()
+
+
+def _prefetch_java_classes():
+    """
+    Parse the configured Java directory so the first agent finds it cached.
+    """
+    try:
+        parse_java_classes(get_settings().java_dir)
+    except Exception as e:
+        logger.warning(f"Java class prefetch failed: {str(e)}")
+
+
+# Started at import so parsing overlaps with the rest of startup instead of
+# adding to the first request; parse_java_classes caches each parsed file.
+# This is the one place settings are loaded at import time: JAVA_DIR has to
+# be in the environment or .env before this module is imported, and an agent
+# given another java_dir parses it itself.
+_JAVA_CLASSES_PREFETCH = threading.Thread(
+    target=_prefetch_java_classes, name="java-classes-prefetch", daemon=True
+)
+_JAVA_CLASSES_PREFETCH.start()
+
+
+def _make_tool_call(name, arguments, call_id=None):
+    """
+    Build a tool call shaped like the ones in OpenAI responses.
+
+    Used for calls the agent assembles itself, from streamed fragments or
+    from local intent routing.
+
+    Args:
+        name (str): Function name
+        arguments (str): JSON-encoded function arguments
+        call_id (str): Tool call ID; a new one is generated if omitted
+
+    Returns:
+        SimpleNamespace: Object with id, type and function attributes
+    """
+    return SimpleNamespace(
+        id=call_id or f"call_{uuid.uuid4().hex}",
+        type="function",
+        function=SimpleNamespace(name=name, arguments=arguments),
+    )
 
 
 class DroolsLLMAgent:
@@ -21,29 +219,113 @@ class DroolsLLMAgent:
     LLM-centric agent for handling natural language interactions to manage Drools rules.
     """
 
-    def __init__(self, api_key, model="gpt-4o-mini", rules_dir=None, java_dir=None):
+    # Maps each function exposed to the LLM to the method that handles it.
+    # Read-only so nothing can register extra callables at runtime.
+    FUNCTION_HANDLERS = MappingProxyType({
+        "validate_user_input": "_validate_user_input",
+        "add_rule": "_add_rule",
+        "edit_rule": "_edit_rule",
+        "delete_rule": "_delete_rule",
+        "search_rules": "_search_rules",
+    })
+
+    # Once history (excluding the system prompt) grows past
+    # MAX_HISTORY_MESSAGES, older turns are folded into a summary and only
+    # about COMPACT_TO_MESSAGES recent ones are kept. Compacting in large
+    # steps leaves history append-only in between, so the prompt prefix stays
+    # byte-identical across turns and OpenAI's prompt caching keeps hitting.
+    MAX_HISTORY_MESSAGES = 30
+    COMPACT_TO_MESSAGES = 12
+    # The same, by estimated size: a few long turns (large search results,
+    # pasted rule text) can outgrow the prompt long before the message cap
+    MAX_HISTORY_TOKENS = 6000
+    COMPACT_TO_TOKENS = 3000
+    SUMMARY_MODEL = "gpt-4o-mini"
+
+    # Picking a tool (or answering small talk) is a classification step, so it
+    # runs on a small, fast model; replies built from tool output use self.model
+    ROUTER_MODEL = "gpt-4o-mini"
+
+    # Rough budget for the Java class listing embedded in validation prompts,
+    # in tokens (estimated at four characters per token)
+    JAVA_CLASSES_PROMPT_TOKENS = 3000
+
+    # Rough prompt budget for one batched search-formatting request, in tokens
+    # (estimated at four characters per token)
+    MAX_BATCH_TOKENS = 6000
+    # Answer quality and latency drop off as more searches share one prompt
+    MAX_BATCH_QUERIES = 16
+    # Most messages handle_user_messages_parallel works on at once
+    MAX_PARALLEL_MESSAGES = 8
+
+    # Replies to opening search questions are reused for identical queries,
+    # and for differently worded ones whose embeddings are at least
+    # SEARCH_CACHE_SIMILARITY (cosine) close
+    # Entries are dropped once rules change (any agent in this process bumps
+    # the search generation) or after SEARCH_CACHE_TTL, which bounds
+    # staleness from changes made by other processes
+    SEARCH_CACHE_SIZE = 512
+    SEARCH_CACHE_SIMILARITY = 0.95
+    SEARCH_CACHE_TTL = SEARCH_RESULT_CACHE_TTL
+
+    # Functions that change the rule set and therefore invalidate cached searches
+    MUTATING_FUNCTIONS = frozenset({"add_rule", "edit_rule", "delete_rule"})
+
+    # Opening messages that are plainly a search are routed straight to
+    # search_rules, skipping the routing completion. Add and edit still need
+    # validation and delete needs confirmation, so only searches are routed.
+    SEARCH_INTENT_PATTERN = re.compile(
+        r"^\s*(?:please\s+|can you\s+|could you\s+)?"
+        r"(?:search|find|list|show(?:\s+me)?|look\s+up)\b.*\brules?\b",
+        re.IGNORECASE | re.DOTALL,
+    )
+    MUTATING_INTENT_PATTERN = re.compile(
+        r"\b(?:add|create|edit|update|change|modify|delete|remove)\b", re.IGNORECASE
+    )
+    # Marker the validation prompts ask the model to emit when a request passes;
+    # searched case-insensitively without copying the reply to upper case
+    VALIDATION_PASSED_PATTERN = re.compile(r"VALIDATION_PASSED", re.IGNORECASE)
+    # Rule file names are built from Java class names; split camel case and
+    # underscores so directly listed results read as plain words
+    RULE_NAME_WORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+    # Directly listed search results must score at least SEARCH_REPLY_MIN_SCORE
+    # (cosine) and lie within SEARCH_REPLY_SCORE_MARGIN of the best hit, so
+    # the tail of the top-k isn't presented as a match
+    SEARCH_REPLY_MIN_SCORE = 0.3
+    SEARCH_REPLY_SCORE_MARGIN = 0.1
+
+    def __init__(
+        self, api_key, model="gpt-4o-mini", rules_dir=None, java_dir=None,
+        router_model=None,
+    ):
         """
         Initialize the Drools LLM Agent.
 
         Args:
             api_key (str): OpenAI API key
-            model (str): OpenAI model to use
+            model (str): OpenAI model to use for replies
             rules_dir (str): Directory to store rules
             java_dir (str): Directory containing Java class files
+            router_model (str): OpenAI model used to pick tools, defaults to
+                ROUTER_MODEL
         """
         try:
             log_operation(
                 "agent_initialization",
                 {
                     "model": model,
+                    "router_model": router_model or self.ROUTER_MODEL,
                     "rules_dir": rules_dir,
                     "java_dir": java_dir,
                 },
             )
 
-            # Set up OpenAI client
-            self.client = OpenAI(api_key=api_key)
+            # Set up OpenAI clients, shared with every other agent using this key
+            self.client = get_openai_client(api_key)
+            self.async_client = get_async_openai_client(api_key)
             self.model = model
+            self.router_model = router_model or self.ROUTER_MODEL
             self.api_key = api_key
             self.collection_name = 'rule-master-dev'
             logger.debug("OpenAI client initialized")
@@ -58,12 +340,19 @@ class DroolsLLMAgent:
             os.makedirs(self.deleted_rules_dir, exist_ok=True)
 
             # Set up Java class mapping
-            self.java_dir = java_dir or os.getenv("JAVA_DIR", "")
+            self.java_dir = java_dir or get_settings().java_dir
             self.java_classes_map = self._load_java_classes()
+            self._java_classes_digest = hashlib.sha256(
+                orjson.dumps(self.java_classes_map, option=orjson.OPT_SORT_KEYS)
+            ).hexdigest()
             logger.debug(f"Java classes mapped: {list(self.java_classes_map.keys())}")
 
             # Set up conversation history
             self.messages = []
+            self._search_cache = OrderedDict()
+
+            # Bind the tool handlers once rather than looking them up per call
+            self._bind_function_handlers()
 
             # Set up system prompt
             self._setup_system_prompt()
@@ -73,38 +362,64 @@ class DroolsLLMAgent:
             log_operation("agent_initialization", error=e)
             raise
 
+    def _bind_function_handlers(self):
+        """Bind FUNCTION_HANDLERS to this instance's methods."""
+        self._function_handlers = {
+            name: getattr(self, method)
+            for name, method in self.FUNCTION_HANDLERS.items()
+        }
+
     def _setup_system_prompt(self):
         """
         Set up the system prompt for the LLM.
         """
         logger.debug("Setting up system prompt")
-        system_prompt = """
-        You are a Drools rule assistant that helps users create, search, edit, and delete Drools rules in a natural, conversational way. 
-        
-        **CRITICAL RULE: Always speak in plain NL and don't expose Java class or method names.
-        E.g "total expected sales" instead of totalExpectedSales**
-        
-        General guidelines:
-        - Call validate_user_input in case of add, edit intents to validate the request and receive the refined user intent in natural language before proceeding with rule creation or editing using the refined user intent.
-        - If user intent is to search, find, or list rules, call the search_rules function passing the user's query as input.
-        - If user sends a delete command and provided the rule name to delete, follow below steps:
-            1. Call search_rules function passing the user's query as input.
-            2. Show the matching rule details back to the user in natural language. 
-            3. Ask user for confirmation to delete the rule.
-            4. Only after confirming with user to proceed with the action, call the delete_rule function.
-        - If user sends a delete command, and the user provided a description of the rule to delete **or** didn't provide the exact rule name, follow the below steps:
-            1. Call search_rules function passing the user's query as input.
-            2. Show the matching rule names with brief description back to the user in natural language.
-            3. Once they pick a single rule, ask user for confirmation to delete the rule. 
-            4. Only after confirming with user to proceed with the action, call the delete_rule function.
-        - Maintain conversational, helpful tone throughout.
-        
-        Always respond in a helpful, conversational manner.
-        """
-        
-        self.messages.append({"role": "system", "content": system_prompt})
+        self.messages.append({"role": "system", "content": SYSTEM_PROMPT})
         logger.debug("System prompt added to messages")
 
+    def load_conversation(self, messages=None):
+        """
+        Replace the conversation history, keeping the system prompt.
+
+        Args:
+            messages (list): Messages to resume from, excluding the system
+                prompt. Starts a fresh conversation if omitted.
+        """
+        self.messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        self.messages.extend(messages or [])
+        logger.debug(f"Loaded conversation with {len(self.messages) - 1} messages")
+
+    def export_conversation(self):
+        """
+        Return the conversation history for persistence.
+
+        Returns:
+            list: Messages excluding the system prompt
+        """
+        return self.messages[1:]
+
+    def _discard_turn(self, turn_start):
+        """
+        Drop a failed turn from the conversation history.
+
+        The error is reported to the user, but keeping it in history would
+        resend it on every later request. If tools already ran in this turn
+        (a rule may have been added or deleted), the user message and the
+        recorded tool exchange are kept so the model knows what happened;
+        only the failed reply after them is dropped.
+
+        Args:
+            turn_start (int): Length of the history before the turn began
+        """
+        keep = max(turn_start, 1)
+        for index in range(len(self.messages) - 1, keep - 1, -1):
+            message = self.messages[index]
+            # Tool messages, or the system notes they are collapsed into
+            if message["role"] in ("tool", "system"):
+                keep = index + 1
+                break
+        del self.messages[keep:]
+
     def _load_java_classes(self):
         """
         Load Java classes and their package, class name, and methods.
@@ -113,14 +428,15 @@ class DroolsLLMAgent:
             dict: Dictionary mapping class names to package, class name, and methods
         """
         try:
-            # Import the map_java_classes function
+            if self.java_dir == get_settings().java_dir:
+                # Wait for the import-time prefetch rather than parsing twice
+                _JAVA_CLASSES_PREFETCH.join()
             return parse_java_classes(self.java_dir)
         except Exception as e:
-            # If the module is not available, return default mapping
-            logger.info(f"Error parsing Java Classes: {str(e)}", exc_info=True)
-            error_message = f"Error processing message: {str(e)}"
-            self.messages.append({"role": "assistant", "content": error_message})
-            return error_message
+            # Fall back to an empty mapping; conversation history isn't set
+            # up yet and an error string is no use as a class map
+            logger.error(f"Error parsing Java Classes: {str(e)}", exc_info=True)
+            return {}
 
     @log_decorator("handle_message")
     def handle_user_message(self, user_input):
@@ -134,118 +450,1074 @@ class DroolsLLMAgent:
             str: Agent response
         """
         print(">> RAW USER INPUT:", user_input)
+        cache_key = self._search_cache_key(user_input)
+        reply_key = self._reply_cache_key(user_input)
+        cached_reply = self._get_cached_reply(reply_key)
+        if cached_reply is None:
+            cached_reply = self._get_cached_search_reply(user_input)
+        routed_call = self._route_obvious_intent(user_input)
+
         # Add user message to conversation
+        turn_start = len(self.messages)
         self.messages.append({"role": "user", "content": user_input})
 
-        # Define available functions
-        functions = self._get_function_definitions()
+        if cached_reply is not None:
+            logger.info("Returning cached reply")
+            self.messages.append({"role": "assistant", "content": cached_reply})
+            return cached_reply
+
+        # Define available tools
+        tools = self._get_tool_definitions()
 
         try:
 
             while True:
 
-                # Call OpenAI with function definitions
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=self.messages,
-                    functions=functions,
-                    function_call="auto",
-                )
+                if routed_call is not None:
+                    message = SimpleNamespace(content=None, tool_calls=[routed_call])
+                else:
+                    # Call OpenAI with tool definitions
+                    response = self.client.chat.completions.create(
+                        model=self.router_model,
+                        messages=self.messages,
+                        tools=tools,
+                        tool_choice="auto",
+                    )
 
-                # Extract the message
-                message = response.choices[0].message
+                    log_prompt_cache_usage(response, "route_message")
 
-                # Handle function calls if present
-                if message.function_call:
-                    print(f">> ASSISTANT WANTS TO CALL: {message.function_call.name}")
-                    print(">> WITH ARGUMENTS:", message.function_call.arguments)
+                    # Extract the message
+                    message = response.choices[0].message
 
-                    function_response = self._handle_function_call(
-                        message.function_call
-                    )
+                # Handle tool calls if present
+                if message.tool_calls:
+                    for tool_call in message.tool_calls:
+                        print(f">> ASSISTANT WANTS TO CALL: {tool_call.function.name}")
+                        print(">> WITH ARGUMENTS:", tool_call.function.arguments)
+
+                    tool_responses = self._run_tool_calls(message.tool_calls)
+
+                    # Add tool calls and responses to conversation
+                    self._record_tool_calls(message.tool_calls, tool_responses)
 
-                    # Add function call and response to conversation
-                    self.messages.append(
-                        {
-                            "role": "assistant",
-                            "content": None,
-                            "function_call": {
-                                "name": message.function_call.name,
-                                "arguments": message.function_call.arguments,
-                            },
-                        }
+                    reply = self._direct_tool_reply(
+                        message.tool_calls, tool_responses, routed_call is not None
                     )
-                    self.messages.append(
-                        {
-                            "role": "function",
-                            "name": message.function_call.name,
-                            "content": json.dumps(function_response),
-                        }
+                    if reply is None:
+                        # Ask the LLM to turn the tool output into a natural reply
+                        followup = self.client.chat.completions.create(
+                            model=self.model, messages=self.messages
+                        )
+                        log_prompt_cache_usage(followup, "tool_followup")
+
+                        reply = followup.choices[0].message.content
+                    self._finish_tool_turn(
+                        message.tool_calls, tool_responses, reply, cache_key, user_input
                     )
+                    return reply
+                
+                reply = message.content
+                # If no function call, return the message content
+                self.messages.append({"role": "assistant", "content": reply})
+                self._cache_reply(reply_key, reply)
+                self._compact_history()
+                logger.info("Final response generated")
+                return reply
 
-                    # Get final response from LLM
-                    followup = self.client.chat.completions.create(
-                        model=self.model, messages=self.messages
-                    )
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            error_message = describe_openai_error(e)
+            self._discard_turn(turn_start)
+            return error_message
 
-                    # now ask the LLM *once more* to turn that function output into a natural reply
+    def handle_user_message_stream(self, user_input):
+        """
+        Handle a user message and stream the response as it is generated.
+
+        Tool calls are assembled from the streamed fragments and executed
+        once complete; the natural-language reply that follows is streamed too.
+
+        Args:
+            user_input (str): User message
+
+        Yields:
+            str: Fragments of the agent response
+        """
+        cache_key = self._search_cache_key(user_input)
+        reply_key = self._reply_cache_key(user_input)
+        cached_reply = self._get_cached_reply(reply_key)
+        if cached_reply is None:
+            cached_reply = self._get_cached_search_reply(user_input)
+        routed_call = self._route_obvious_intent(user_input)
+        turn_start = len(self.messages)
+        self.messages.append({"role": "user", "content": user_input})
+
+        if cached_reply is not None:
+            logger.info("Returning cached reply")
+            self.messages.append({"role": "assistant", "content": cached_reply})
+            yield cached_reply
+            return
+
+        tools = self._get_tool_definitions()
+
+        try:
+            reply_parts = []
+            tool_calls = []
+            if routed_call is not None:
+                tool_calls.append(routed_call)
+                stream = ()
+            else:
+                stream = self.client.chat.completions.create(
+                    model=self.router_model,
+                    messages=self.messages,
+                    tools=tools,
+                    tool_choice="auto",
+                    stream=True,
+                )
+
+            # Tool call fragments arrive keyed by their index in the message
+            fragments = {}
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    for part in delta.tool_calls:
+                        fragment = fragments.setdefault(
+                            part.index, {"id": "", "name": "", "arguments": []}
+                        )
+                        fragment["id"] = part.id or fragment["id"]
+                        if part.function:
+                            fragment["name"] += part.function.name or ""
+                            fragment["arguments"].append(part.function.arguments or "")
+                elif delta.content:
+                    reply_parts.append(delta.content)
+                    yield delta.content
+            tool_calls.extend(
+                _make_tool_call(
+                    fragment["name"], "".join(fragment["arguments"]), fragment["id"]
+                )
+                for _, fragment in sorted(fragments.items())
+            )
+
+            if tool_calls:
+                for tool_call in tool_calls:
+                    logger.info(f"Assistant requested function: {tool_call.function.name}")
+                tool_responses = self._run_tool_calls(tool_calls)
+                self._record_tool_calls(tool_calls, tool_responses)
+
+                direct_reply = self._direct_tool_reply(
+                    tool_calls, tool_responses, routed_call is not None
+                )
+                if direct_reply is not None:
+                    reply_parts.append(direct_reply)
+                    yield direct_reply
+                else:
                     followup = self.client.chat.completions.create(
-                        model=self.model, messages=self.messages
+                        model=self.model, messages=self.messages, stream=True
                     )
+                    for chunk in followup:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            reply_parts.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+
+            reply = "".join(reply_parts)
+            if tool_calls:
+                self._finish_tool_turn(
+                    tool_calls, tool_responses, reply, cache_key, user_input
+                )
+            else:
+                self.messages.append({"role": "assistant", "content": reply})
+                self._cache_reply(reply_key, reply)
+                self._compact_history()
+            logger.info("Final response generated")
 
-                    reply = followup.choices[0].message.content
-                    self.messages.append({"role": "assistant", "content": reply})
-                    return reply
-                
+        except Exception as e:
+            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            error_message = describe_openai_error(e)
+            self._discard_turn(turn_start)
+            yield error_message
+
+    async def handle_user_message_async(self, user_input):
+        """
+        Handle a user message without blocking the event loop.
+
+        Mirrors handle_user_message, but awaits the OpenAI calls so that many
+        sessions can be served concurrently from one process. Searches run on
+        the async clients; the other tools run in a worker thread. Tool calls
+        from the same response are dispatched concurrently.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            str: Agent response
+        """
+        cache_key = self._search_cache_key(user_input)
+        reply_key = self._reply_cache_key(user_input)
+        cached_reply = self._get_cached_reply(reply_key)
+        if cached_reply is None:
+            # The lookup may embed the message with the sync client
+            cached_reply = await asyncio.to_thread(
+                self._get_cached_search_reply, user_input
+            )
+        routed_call = self._route_obvious_intent(user_input)
+        turn_start = len(self.messages)
+        self.messages.append({"role": "user", "content": user_input})
+
+        if cached_reply is not None:
+            logger.info("Returning cached reply")
+            self.messages.append({"role": "assistant", "content": cached_reply})
+            return cached_reply
+
+        tools = self._get_tool_definitions()
+
+        try:
+            if routed_call is not None:
+                message = SimpleNamespace(content=None, tool_calls=[routed_call])
+            else:
+                response = await self._async_chat_completion(
+                    model=self.router_model,
+                    messages=self.messages,
+                    tools=tools,
+                    tool_choice="auto",
+                )
+                log_prompt_cache_usage(response, "route_message")
+                message = response.choices[0].message
+
+            if not message.tool_calls:
                 reply = message.content
-                # If no function call, return the message content
                 self.messages.append({"role": "assistant", "content": reply})
+                self._cache_reply(reply_key, reply)
+                await asyncio.to_thread(self._compact_history)
                 logger.info("Final response generated")
                 return reply
 
+            for tool_call in message.tool_calls:
+                logger.info(f"Assistant requested function: {tool_call.function.name}")
+            tool_responses = await self._run_tool_calls_async(message.tool_calls)
+            self._record_tool_calls(message.tool_calls, tool_responses)
+
+            reply = self._direct_tool_reply(
+                message.tool_calls, tool_responses, routed_call is not None
+            )
+            if reply is None:
+                followup = await self._async_chat_completion(
+                    model=self.model, messages=self.messages
+                )
+                log_prompt_cache_usage(followup, "tool_followup")
+                reply = followup.choices[0].message.content
+
+            await asyncio.to_thread(
+                self._finish_tool_turn,
+                message.tool_calls,
+                tool_responses,
+                reply,
+                cache_key,
+                user_input,
+            )
+            logger.info("Final response generated")
+            return reply
+
         except Exception as e:
             logger.error(f"Error processing message: {str(e)}", exc_info=True)
-            error_message = f"Error processing message: {str(e)}"
-            self.messages.append({"role": "assistant", "content": error_message})
+            error_message = describe_openai_error(e)
+            self._discard_turn(turn_start)
             return error_message
 
+    async def handle_user_messages_parallel(self, inputs):
+        """
+        Handle several independent user messages concurrently.
+
+        Each message is answered as the opening turn of its own conversation,
+        on a shallow copy of this agent with a fresh history and search
+        cache, so the turns neither see nor change self.messages. Any of them
+        may have changed rules, so this agent's search cache is cleared
+        afterwards. At most MAX_PARALLEL_MESSAGES turns run at once, and
+        requests to OpenAI are still bounded by the process-wide request
+        semaphore.
+
+        Args:
+            inputs (list): User messages
+
+        Returns:
+            list: One reply per message, in the same order
+        """
+
+        semaphore = asyncio.Semaphore(self.MAX_PARALLEL_MESSAGES)
+
+        async def _one(user_input):
+            async with semaphore:
+                agent = copy.copy(self)
+                agent._search_cache = OrderedDict()
+                # The copied handlers are still bound to self
+                agent._bind_function_handlers()
+                agent.load_conversation()
+                return await agent.handle_user_message_async(user_input)
+
+        replies = await asyncio.gather(*(_one(user_input) for user_input in inputs))
+        self._search_cache.clear()
+        return replies
+
+    def handle_search_queries_batch(self, queries):
+        """
+        Answer several independent search queries with a single LLM request.
+
+        Each query is run through search_rules, then the results for a whole
+        batch are rendered in one completion instead of one per query. Only
+        stateless searches are supported; the conversation history is not
+        read or modified.
+
+        Args:
+            queries (list): Natural language search queries
+
+        Returns:
+            list: One reply per query, in the same order
+        """
+        # Embed all queries in one request; each search then hits the cache
+        try:
+            get_embeddings(list(queries), self.client)
+        except Exception as e:
+            logger.warning(f"Batched query embedding failed: {str(e)}")
+        results = [self._search_rules({"query": query}) for query in queries]
+
+        replies = []
+        batch = []
+        batch_chars = 0
+        for query, result in zip(queries, results):
+            entry = (query, orjson.dumps(result).decode())
+            entry_chars = len(entry[0]) + len(entry[1])
+            if batch and (
+                len(batch) >= self.MAX_BATCH_QUERIES
+                or (batch_chars + entry_chars) // 4 > self.MAX_BATCH_TOKENS
+            ):
+                replies.extend(self._format_search_batch(batch))
+                batch, batch_chars = [], 0
+            batch.append(entry)
+            batch_chars += entry_chars
+        if batch:
+            replies.extend(self._format_search_batch(batch))
+        return replies
+
+    def _format_search_batch(self, batch):
+        """
+        Render a batch of search results into natural-language replies.
+
+        Queries whose <<<N>>> answer is missing from the reply are formatted
+        again one at a time.
+
+        Args:
+            batch (list): (query, serialized search result) pairs
+
+        Returns:
+            list: One reply per pair, in the same order
+        """
+        numbered = "\n".join(
+            f"{index}) Query: {query}\n   Results: {result}"
+            for index, (query, result) in enumerate(batch, 1)
+        )
+        instructions = (
+            "Answer each of the following rule searches independently, describing the "
+            "matching rules in plain business language. Start the answer to search N "
+            "with the marker <<<N>>> on its own line.\n\n" + numbered
+        )
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": instructions},
+                ],
+            )
+            content = response.choices[0].message.content or ""
+        except Exception as e:
+            logger.error(f"Error formatting search batch: {str(e)}", exc_info=True)
+            return [f"Error processing message: {str(e)}"] * len(batch)
+
+        answers = {}
+        parts = re.split(r"<<<(\d+)>>>", content)
+        for number, answer in zip(parts[1::2], parts[2::2]):
+            answers[int(number)] = answer.strip()
+
+        if len(batch) == 1:
+            # A lone answer is usable even if the model dropped the marker
+            answer = answers.get(1) or content.strip()
+            return [answer or "Error processing message: no answer was generated"]
+        for index in range(1, len(batch) + 1):
+            if not answers.get(index):
+                logger.warning(f"No answer for search {index} in batch, formatting it alone")
+                answers[index] = self._format_search_batch([batch[index - 1]])[0]
+        return [answers[index] for index in range(1, len(batch) + 1)]
+
+    @classmethod
+    def submit_batch(cls, api_key, prompts, model="gpt-4o-mini"):
+        """
+        Submit independent user prompts through the OpenAI Batch API.
+
+        Intended for offline workloads (bulk regeneration, regression runs over
+        past chats) where a 24h turnaround is acceptable in exchange for the
+        lower batch pricing. Each prompt is sent as a fresh conversation with
+        the agent system prompt and function definitions.
+
+        Args:
+            api_key (str): OpenAI API key
+            prompts (list): User prompts to process
+            model (str): OpenAI model to use
+
+        Returns:
+            str: ID of the created batch
+        """
+        client = get_openai_client(api_key)
+
+        lines = []
+        for index, prompt in enumerate(prompts):
+            lines.append(
+                orjson.dumps(
+                    {
+                        "custom_id": f"request-{index}",
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": {
+                            "model": model,
+                            "messages": [
+                                {"role": "system", "content": SYSTEM_PROMPT},
+                                {"role": "user", "content": prompt},
+                            ],
+                            "tools": TOOL_DEFINITIONS,
+                        },
+                    }
+                )
+            )
+
+        batch_file = client.files.create(
+            file=("rule_requests.jsonl", b"\n".join(lines)),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        log_operation(
+            "batch_submission", {"batch_id": batch.id, "request_count": len(prompts)}
+        )
+        return batch.id
+
+    @classmethod
+    def wait_for_batch(cls, api_key, batch_id, poll_interval=30):
+        """
+        Wait for a batch submitted with submit_batch and return its results.
+
+        Args:
+            api_key (str): OpenAI API key
+            batch_id (str): ID returned by submit_batch
+            poll_interval (int): Seconds between status checks
+
+        Returns:
+            dict: Mapping of custom_id to the chat completion response body
+        """
+        client = get_openai_client(api_key)
+
+        while True:
+            batch = client.batches.retrieve(batch_id)
+            logger.info(f"Batch {batch_id} status: {batch.status}")
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            time.sleep(poll_interval)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch_id} finished with status: {batch.status}")
+
+        results = {}
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            results[entry["custom_id"]] = entry["response"]["body"]
+        return results
+
+    async def _async_chat_completion(self, **kwargs):
+        """
+        Create a chat completion with the async client, respecting the shared
+        concurrency limit.
+
+        Returns:
+            ChatCompletion: OpenAI response
+        """
+        async with get_request_semaphore():
+            return await self.async_client.chat.completions.create(**kwargs)
+
+    def _compact_history(self):
+        """
+        Fold older conversation turns into a single summary message.
+
+        Runs only once history exceeds MAX_HISTORY_MESSAGES or an estimated
+        MAX_HISTORY_TOKENS, then keeps the system prompt and at most the
+        COMPACT_TO_MESSAGES most recent messages, trimmed further to about
+        COMPACT_TO_TOKENS. The kept window always starts at a user message so
+        a tool call is never separated from its response.
+        """
+        history = self.messages[1:]
+        if (
+            len(history) <= self.MAX_HISTORY_MESSAGES
+            and self._estimate_tokens(history) <= self.MAX_HISTORY_TOKENS
+        ):
+            return
+
+        # The latest turn is always kept verbatim, however large it is
+        last_user = max(
+            (index for index, message in enumerate(history) if message.get("role") == "user"),
+            default=len(history),
+        )
+        cut = min(max(len(history) - self.COMPACT_TO_MESSAGES, 0), last_user)
+        while (
+            cut < last_user
+            and self._estimate_tokens(history[cut:]) > self.COMPACT_TO_TOKENS
+        ):
+            cut += 1
+        while cut < len(history) and history[cut].get("role") != "user":
+            cut += 1
+        older, recent = history[:cut], history[cut:]
+        if not older:
+            return
+
+        summary = self._summarize_messages(older)
+        compacted = [self.messages[0]]
+        if summary:
+            compacted.append(
+                {"role": "system", "content": f"Prior conversation summary: {summary}"}
+            )
+        self.messages = compacted + recent
+        logger.info(f"Compacted {len(older)} older messages into a summary")
+
+    @staticmethod
+    def _estimate_tokens(messages):
+        """
+        Roughly estimate the prompt tokens taken by messages.
+
+        Uses the same four-characters-per-token estimate as MAX_BATCH_TOKENS.
+
+        Args:
+            messages (list): Chat messages
+
+        Returns:
+            int: Estimated token count
+        """
+        chars = 0
+        for message in messages:
+            chars += len(message.get("content") or "")
+            for tool_call in message.get("tool_calls") or ():
+                chars += len(tool_call["function"]["arguments"])
+        return chars // 4
+
+    def _summarize_messages(self, messages):
+        """
+        Summarize conversation messages with a small model.
+
+        Args:
+            messages (list): Messages to summarize
+
+        Returns:
+            str: Summary text, or an empty string if summarization failed
+        """
+        # Raw function payloads are chatter the assistant's replies already
+        # describe; leaving them out keeps the summary request small
+        transcript = "\n".join(
+            f"{message['role']}: {message['content']}"
+            for message in messages
+            if message.get("content") and message.get("role") != "tool"
+        )
+        if not transcript:
+            return ""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.SUMMARY_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "Summarize this conversation between a user and a Drools rule "
+                            "assistant. Keep rule names, pending confirmations and any "
+                            "decisions the user made. Be concise."
+                        ),
+                    },
+                    {"role": "user", "content": transcript},
+                ],
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}", exc_info=True)
+            return ""
+
+    def _finish_tool_turn(
+        self, tool_calls, tool_responses, reply, cache_key=None, user_input=None
+    ):
+        """
+        Record the reply to a turn that called tools and tidy up the history.
+
+        Args:
+            tool_calls (list): Tool calls made in this turn
+            tool_responses (list): Result returned for each tool call
+            reply (str): Reply shown to the user
+            cache_key (str): Search cache key for the turn, if any
+            user_input (str): User message that started the turn
+        """
+        self.messages.append({"role": "assistant", "content": reply})
+        self._collapse_tool_exchange(tool_calls, tool_responses)
+        if all(tool_call.function.name == "search_rules" for tool_call in tool_calls):
+            self._cache_search_reply(cache_key, reply, user_input)
+        self._compact_history()
+
+    def _collapse_tool_exchange(self, tool_calls, tool_responses):
+        """
+        Shrink a finished tool exchange once the assistant has replied.
+
+        The raw tool calls and their JSON responses are resent on every later
+        request. An exchange made up only of add/edit/delete calls is replaced
+        with one-line tool notes. Search results are cut down to their status
+        and rule file names, which is all follow-up turns refer back to.
+        Validation results are kept as they are.
+
+        Args:
+            tool_calls (list): Tool calls made in this turn
+            tool_responses (list): Result returned for each tool call
+        """
+        # Exchange layout: assistant tool_calls message, one tool message per
+        # call, then the assistant reply
+        start = len(self.messages) - len(tool_calls) - 2
+        if start < 1 or not self.messages[start].get("tool_calls"):
+            return
+
+        names = [tool_call.function.name for tool_call in tool_calls]
+        if all(name in self.MUTATING_FUNCTIONS for name in names):
+            notes = []
+            for name, function_response in zip(names, tool_responses):
+                status = "ok" if function_response.get("success") else "failed"
+                detail = function_response.get("rule_name") or function_response.get(
+                    "message", ""
+                )
+                notes.append(
+                    {"role": "system", "content": f"[tool {name} {status}: {detail}]"}
+                )
+            self.messages[start:-1] = notes
+            return
+
+        for offset, (name, function_response) in enumerate(zip(names, tool_responses), 1):
+            if name != "search_rules":
+                continue
+            self.messages[start + offset]["content"] = orjson.dumps(
+                {
+                    "status": function_response.get("status", "error"),
+                    "rule_names": [
+                        result.get("filesystem_filename")
+                        for result in function_response.get("results", [])
+                    ],
+                }
+            ).decode()
+
+    def _direct_tool_reply(self, tool_calls, tool_responses, routed=False):
+        """
+        Build the reply for finished add/edit/delete calls without another LLM call.
+
+        These tools are terminal and already return a user-facing message
+        for both outcomes, so having the model rephrase it only adds a
+        round-trip. Calls refused by _reject_batched_changes are left to
+        the model, which should ask the user to confirm. Searches routed by
+        _route_obvious_intent are plain lookups and are listed directly too.
+        Other searches (which may be the first step of a delete) and
+        validation results still go through the model.
+
+        Args:
+            tool_calls (list): Tool calls made in this turn
+            tool_responses (list): Result returned for each tool call
+            routed (bool): Whether the calls came from _route_obvious_intent
+
+        Returns:
+            str: Reply for the user, or None if the model should write it
+        """
+        if routed:
+            return self._format_search_reply(tool_responses[0])
+
+        lines = []
+        for tool_call, function_response in zip(tool_calls, tool_responses):
+            message = function_response.get("message")
+            if (
+                tool_call.function.name not in self.MUTATING_FUNCTIONS
+                or not message
+                or function_response.get("refused")
+            ):
+                return None
+            lines.append(
+                f"✅ {message}" if function_response.get("success") else f"❌ {message}"
+            )
+        return "\n\n".join(lines)
+
+    def _format_search_reply(self, function_response):
+        """
+        List search results for the user without an LLM call.
+
+        Only hits passing the relevance cutoff are listed, and rule names
+        are turned into lowercase words so no Java names are shown.
+
+        Args:
+            function_response (dict): Result returned by search_rules
+
+        Returns:
+            str: Reply for the user, or None if the search failed and the
+            model should explain it
+        """
+        if function_response.get("status") != "success":
+            return None
+        results = function_response.get("results", [])
+        if results:
+            best = max(result.get("relevance_score", 0.0) for result in results)
+            cutoff = max(self.SEARCH_REPLY_MIN_SCORE, best - self.SEARCH_REPLY_SCORE_MARGIN)
+            results = [
+                result for result in results if result.get("relevance_score", 0.0) >= cutoff
+            ]
+        if not results:
+            return "I couldn't find any rules matching that."
+
+        lines = [
+            f"I found {len(results)} matching rule{'s' if len(results) != 1 else ''}:"
+        ]
+        for result in results:
+            name = os.path.splitext(result.get("filesystem_filename", ""))[0]
+            words = self.RULE_NAME_WORD_PATTERN.findall(name)
+            lines.append(f"- **{' '.join(words).lower()}**: {result.get('refined_prompt', '')}")
+        return "\n".join(lines)
+
+    def _search_cache_key(self, user_input):
+        """
+        Build the search cache key for a message opening a conversation.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            str: Cache key, or None if the conversation already has context
+        """
+        if len(self.messages) > 1:
+            return None
+        normalized = " ".join(user_input.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _reply_cache_key(self, user_input):
+        """
+        Build the reply cache key for a message in the current conversation.
+
+        The key covers the whole history as well as the message, so a reply
+        is only reused where the model would see exactly the same prompt.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            str: Cache key
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(orjson.dumps(self.messages))
+        digest.update(user_input.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_cached_reply(self, key):
+        """
+        Look up the cached reply to a conversational (tool-free) turn.
+
+        Args:
+            key (str): Key from _reply_cache_key
+
+        Returns:
+            str: Cached reply, or None on a miss
+        """
+        with _REPLY_CACHE_LOCK:
+            reply = _REPLY_CACHE.get(key)
+            if reply is not None:
+                _REPLY_CACHE.move_to_end(key)
+        return reply
+
+    def _cache_reply(self, key, reply):
+        """
+        Store the reply to a conversational turn, evicting the oldest entry.
+
+        Turns that called tools are never stored here: their replies depend
+        on the rule set, not just on the conversation.
+
+        Args:
+            key (str): Key from _reply_cache_key
+            reply (str): Reply to cache
+        """
+        if not reply:
+            return
+        with _REPLY_CACHE_LOCK:
+            _REPLY_CACHE[key] = reply
+            _REPLY_CACHE.move_to_end(key)
+            if len(_REPLY_CACHE) > REPLY_CACHE_SIZE:
+                _REPLY_CACHE.popitem(last=False)
+
+    def _route_obvious_intent(self, user_input):
+        """
+        Route an opening message that is plainly a search without asking the LLM.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            SimpleNamespace: Synthesized search_rules tool call, or None if
+            the message should go through the routing completion
+        """
+        if len(self.messages) > 1 or not self.SEARCH_INTENT_PATTERN.match(user_input):
+            return None
+        if self.MUTATING_INTENT_PATTERN.search(user_input):
+            return None
+        logger.info("Routing opening search message directly to search_rules")
+        return _make_tool_call(
+            "search_rules", orjson.dumps({"query": user_input}).decode()
+        )
+
+    def _get_cached_search_reply(self, user_input):
+        """
+        Look up a cached reply for an opening search question.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            str: Cached reply, or None on a miss
+        """
+        key = self._search_cache_key(user_input)
+        if key is None or not self._search_cache:
+            return None
+
+        generation = get_search_result_generation()
+        now = time.monotonic()
+        for cached in [
+            cached
+            for cached, (_, _, cached_generation, stored_at) in self._search_cache.items()
+            if cached_generation != generation or now - stored_at >= self.SEARCH_CACHE_TTL
+        ]:
+            del self._search_cache[cached]
+        if not self._search_cache:
+            return None
+
+        if key not in self._search_cache:
+            # No exact match; fall back to the closest cached query by meaning,
+            # but only for messages that plainly are searches (the same check
+            # _route_obvious_intent makes), so other openings don't pay for an
+            # embedding or get answered with a search listing
+            if not self.SEARCH_INTENT_PATTERN.match(
+                user_input
+            ) or self.MUTATING_INTENT_PATTERN.search(user_input):
+                return None
+            vector = self._query_vector(user_input)
+            if vector is None:
+                return None
+            keys = list(self._search_cache)
+            similarities = np.stack(
+                [self._search_cache[cached][1] for cached in keys]
+            ) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.SEARCH_CACHE_SIMILARITY:
+                return None
+            logger.debug(f"Semantic search cache hit (similarity {similarities[best]:.3f})")
+            key = keys[best]
+
+        self._search_cache.move_to_end(key)
+        return self._search_cache[key][0]
+
+    def _cache_search_reply(self, key, reply, user_input):
+        """
+        Store the reply to an opening search question, evicting the oldest entry.
+
+        Args:
+            key (str): Key from _search_cache_key
+            reply (str): Reply to cache
+            user_input (str): User message the reply answers
+        """
+        if key is None or not reply:
+            return
+        generation = get_search_result_generation()
+        vector = self._query_vector(user_input)
+        if vector is None:
+            return
+        self._search_cache[key] = (reply, vector, generation, time.monotonic())
+        self._search_cache.move_to_end(key)
+        if len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+
+    def _query_vector(self, user_input):
+        """
+        Embed a user message for semantic search cache lookups.
+
+        Goes through the shared embedding cache, so a query that was just
+        searched for isn't embedded again.
+
+        Args:
+            user_input (str): User message
+
+        Returns:
+            numpy.ndarray: Unit-length embedding, or None if embedding failed
+        """
+        try:
+            vector = np.asarray(get_embeddings([user_input], self.client)[0])
+        except Exception as e:
+            logger.warning(f"Could not embed message for the search cache: {str(e)}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _record_tool_calls(self, tool_calls, tool_responses):
+        """
+        Add tool calls and their responses to the conversation.
+
+        Args:
+            tool_calls (list): Tool calls from OpenAI
+            tool_responses (list): Result returned by the handler for each call
+        """
+        self.messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": tool_call.id,
+                        "type": "function",
+                        "function": {
+                            "name": tool_call.function.name,
+                            "arguments": tool_call.function.arguments,
+                        },
+                    }
+                    for tool_call in tool_calls
+                ],
+            }
+        )
+        self.messages.extend(
+            {
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": orjson.dumps(function_response).decode(),
+            }
+            for tool_call, function_response in zip(tool_calls, tool_responses)
+        )
+
+    def _run_tool_calls(self, tool_calls):
+        """
+        Run the tool calls from one assistant response.
+
+        Read-only calls emitted together (e.g. several searches) run in
+        parallel threads, since each one mostly waits on OpenAI or Qdrant.
+        Calls that change rules then run one at a time, in the order the
+        model emitted them, so two changes to the same rule can't race.
+
+        Args:
+            tool_calls (list): Tool calls from OpenAI
+
+        Returns:
+            list: Result for each tool call, in the same order
+        """
+        functions, results = self._reject_batched_changes(tool_calls)
+        read_only = [
+            index
+            for index, function in enumerate(functions)
+            if results[index] is None and function.name not in self.MUTATING_FUNCTIONS
+        ]
+        if len(read_only) > 1:
+            with ThreadPoolExecutor(max_workers=len(read_only)) as executor:
+                for index, result in zip(
+                    read_only,
+                    executor.map(
+                        self._handle_function_call,
+                        [functions[index] for index in read_only],
+                    ),
+                ):
+                    results[index] = result
+        elif read_only:
+            results[read_only[0]] = self._handle_function_call(functions[read_only[0]])
+
+        for index, function in enumerate(functions):
+            if results[index] is None:
+                results[index] = self._handle_function_call(function)
+        return results
+
+    async def _run_tool_calls_async(self, tool_calls):
+        """
+        Execute the tool calls of one assistant message on the event loop.
+
+        After _reject_batched_changes an add/edit/delete call only runs
+        when it is the sole call, so the remaining calls are all safe to
+        await together.
+
+        Args:
+            tool_calls (list): Tool calls from OpenAI
+
+        Returns:
+            list: Result for each tool call, in the same order
+        """
+        functions, results = self._reject_batched_changes(tool_calls)
+        pending = [index for index, result in enumerate(results) if result is None]
+        responses = await asyncio.gather(
+            *(self._handle_function_call_async(functions[index]) for index in pending)
+        )
+        for index, result in zip(pending, responses):
+            results[index] = result
+        return results
+
+    def _reject_batched_changes(self, tool_calls):
+        """
+        Refuse add/edit/delete calls that arrive together with other calls.
+
+        A change must follow the user's confirmation, which can't have
+        happened for a call emitted alongside the search or validation it
+        depends on. The model gets an error back and asks the user first.
+
+        Args:
+            tool_calls (list): Tool calls from OpenAI
+
+        Returns:
+            tuple: (functions, results) where results holds the error response
+                of each refused call and None for the calls to execute
+        """
+        functions = [tool_call.function for tool_call in tool_calls]
+        results = [None] * len(functions)
+        if len(functions) == 1:
+            return functions, results
+        for index, function in enumerate(functions):
+            if function.name in self.MUTATING_FUNCTIONS:
+                logger.warning(f"Refusing {function.name} batched with other tool calls")
+                results[index] = {
+                    "success": False,
+                    "refused": True,
+                    "message": (
+                        f"{function.name} was not run: changes must be requested on "
+                        "their own, after the user has confirmed them"
+                    ),
+                }
+        return functions, results
+
     @log_decorator("function_call")
     def _handle_function_call(self, function_call):
         """
         Handle a function call from the LLM.
 
         Args:
-            function_call: Function call object from OpenAI
+            function_call: Function of a tool call from OpenAI (name and arguments)
 
         Returns:
             dict: Function response
         """
         try:
-            # Extract function name and arguments
-            name = function_call.name
-            args = json.loads(function_call.arguments)
-            logger.info(f"Handling function call: {name}")
-            logger.debug(f"Function arguments: {json.dumps(args)}")
-
-            # Call the appropriate function
-            if name == "validate_user_input":
-                logger.debug("Calling validate_user_input function")
-                return self._validate_user_input(args)
-            if name == "add_rule":
-                logger.debug("Calling add_rule function")
-                return self._add_rule(args)
-            elif name == "edit_rule":
-                logger.debug("Calling edit_rule function")
-                return self._edit_rule(args)
-            elif name == "delete_rule":
-                logger.debug("Calling delete_rule function")
-                return self._delete_rule(args)
-            elif name == "search_rules":
-                logger.debug("Calling search_rules function")
-                return self._search_rules(args)
-            else:
-                logger.warning(f"Unknown function called: {name}")
-                return {"success": False, "message": f"Unknown function: {name}"}
+            name, args, error = self._parse_function_call(function_call)
+            if error is not None:
+                return error
+
+            # Call the appropriate function; only names in the table are reachable
+            logger.debug(f"Calling {name} function")
+            result = self._function_handlers[name](args)
+            if name in self.MUTATING_FUNCTIONS and result.get("success"):
+                self._search_cache.clear()
+            return result
         except Exception as e:
             logger.error(f"Error handling function call: {str(e)}", exc_info=True)
             return {
@@ -253,93 +1525,74 @@ class DroolsLLMAgent:
                 "message": f"Error handling function call: {str(e)}",
             }
 
-    def _get_function_definitions(self):
+    async def _handle_function_call_async(self, function_call):
         """
-        Get the function definitions for the LLM.
+        Handle a function call from the LLM on the event loop.
+
+        Searches are awaited on the async OpenAI and Qdrant clients; the
+        other tools are synchronous and run in a worker thread.
+
+        Args:
+            function_call: Function of a tool call from OpenAI (name and arguments)
 
         Returns:
-            list: List of function definitions
+            dict: Function response
         """
-        return [
-            {
-                "name": "validate_user_input",
-                "description": "Validate user input based on intent before executing add, or edit operations",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "user_input": {
-                            "type": "string",
-                            "description": "The user's input to validate",
-                        },
-                        "intent": {
-                            "type": "string",
-                            "description": "The detected intent (add, edit)",
-                        }
-                    },
-                    "required": ["user_input", "intent"],
-                },
-            },
-            {
-                "name": "add_rule",
-                "description": "Create a new Drools rule from natural language description (only call after validation passes)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "description": {
-                            "type": "string",
-                            "description": "Natural language description of the rule",
-                        }
-                    },
-                    "required": ["description"],
-                },
-            },
-            {
-                "name": "edit_rule",
-                "description": "Modify an existing Drools rule (only call after validation passes)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "rule_name": {
-                            "type": "string",
-                            "description": "Name of the rule to edit",
-                        },
-                        "changes": {
-                            "type": "string",
-                            "description": "Natural language description of the changes to make",
-                        },
-                    },
-                    "required": ["rule_name", "changes"],
-                },
-            },
-            {
-                "name": "delete_rule",
-                "description": "Move a rule to the deleted_rules directory (only call after validation passes)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "rule_name": {
-                            "type": "string",
-                            "description": "Name or description of the rule to move. The system will search for the best match.",
-                        }
-                    },
-                    "required": ["rule_name"],
-                },
-            },
-            {
-                "name": "search_rules",
-                "description": "Search for Drools rules based on natural language query (only call after validation passes)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Natural language search query to find similar rules",
-                        }
-                    },
-                    "required": ["query"],
-                },
-            },
-        ]
+        if function_call.name != "search_rules":
+            return await asyncio.to_thread(self._handle_function_call, function_call)
+
+        try:
+            name, args, error = self._parse_function_call(function_call)
+            if error is not None:
+                return error
+            return await search_rules_async(
+                query=args["query"],
+                client=self.async_client,
+                collection_name=self.collection_name,
+            )
+        except Exception as e:
+            logger.error(f"Error searching rules: {str(e)}", exc_info=True)
+            return {"success": False, "message": f"Error searching rules: {str(e)}"}
+
+    def _parse_function_call(self, function_call):
+        """
+        Parse and validate the arguments of a function call.
+
+        Args:
+            function_call: Function of a tool call from OpenAI (name and arguments)
+
+        Returns:
+            tuple: (name, args, error) where error is a function response
+                dict if the call can't be executed, otherwise None
+        """
+        # Extract function name and arguments
+        name = function_call.name
+        args = orjson.loads(function_call.arguments)
+        logger.info(f"Handling function call: {name}")
+        logger.debug(f"Function arguments: {function_call.arguments}")
+
+        if name not in self.FUNCTION_HANDLERS:
+            logger.warning(f"Unknown function called: {name}")
+            return name, args, {"success": False, "message": f"Unknown function: {name}"}
+
+        try:
+            args = ARGUMENT_VALIDATORS[name](args)
+        except fastjsonschema.JsonSchemaException as e:
+            logger.warning(f"Invalid arguments for {name}: {e.message}")
+            return name, args, {
+                "success": False,
+                "message": f"Invalid arguments for {name}: {e.message}",
+            }
+        return name, args, None
+
+    def _get_tool_definitions(self):
+        """
+        Get the tool definitions for the LLM.
+
+        Returns:
+            list: List of tool definitions
+        """
+        return TOOL_DEFINITIONS
         
     def _validate_user_input(self, args):
         """
@@ -383,6 +1636,7 @@ class DroolsLLMAgent:
                 messages=validation_messages,
                 temperature=0.5
             )
+            log_prompt_cache_usage(validation_response, "validate_user_input")
             
             validation_result = validation_response.choices[0].message.content
             logger.info(f"Validation result: {validation_result}")
@@ -410,30 +1664,40 @@ class DroolsLLMAgent:
         """
         Get formatted Java classes information for validation prompts.
 
+        The listing is kept within JAVA_CLASSES_PROMPT_TOKENS: if the full
+        listing is too large, methods are dropped (validation maps concepts
+        to fields), and if that is still too large the remaining classes
+        are only named.
+
         Returns:
             str: Formatted Java classes information
         """
-        java_classes_info = ""
-        for class_name, class_info in self.java_classes_map.items():
-            package = class_info.get("package", "")
-            methods = class_info.get("methods", [])
-            fields = class_info.get("fields", [])
+        budget = self.JAVA_CLASSES_PROMPT_TOKENS * 4
+        java_classes_info = format_java_classes(self.java_classes_map)
+        if len(java_classes_info) <= budget:
+            return java_classes_info
+
+        java_classes_info = format_java_classes(
+            self.java_classes_map, include_methods=False
+        )
+        if len(java_classes_info) <= budget:
+            logger.info("Java class listing over budget, omitting methods")
+            return java_classes_info
+
+        kept = []
+        kept_chars = 0
+        for line in java_classes_info.splitlines(keepends=True):
+            if kept_chars + len(line) > budget:
+                break
+            kept.append(line)
+            kept_chars += len(line)
+        omitted = list(self.java_classes_map)[len(kept):]
+        logger.info(
+            f"Java class listing over budget, listing {len(omitted)} classes by name only"
+        )
+        kept.append(f"Other classes (fields not listed): {', '.join(omitted)}\n")
+        return "".join(kept)
 
-            java_classes_info += f"\nClass: {class_name}\n"
-            java_classes_info += f"Package: {package}\n"
-
-            if fields:
-                java_classes_info += "Fields:\n"
-                for field in fields:
-                    java_classes_info += f"- {field}\n"
-
-            if methods:
-                java_classes_info += "Methods:\n"
-                for method in methods:
-                    java_classes_info += f"- {method}\n"
-        
-        return java_classes_info
-    
     def _parse_validation_result(self, validation_result):
         """
         Parse the validation result to determine if validation passed.
@@ -444,12 +1708,37 @@ class DroolsLLMAgent:
         Returns:
             bool: True if validation passed, False otherwise
         """
-        return "VALIDATION_PASSED" in validation_result.upper()
+        return self.VALIDATION_PASSED_PATTERN.search(validation_result) is not None
 
     def _get_validation_prompt(self, intent):
         """
         Get the validation prompt based on the intent.
 
+        Prompts only depend on the intent and the Java classes loaded at
+        startup, so each one is built once per process and class map and
+        shared by every agent. Keeping the text byte-identical across turns
+        and sessions also lets OpenAI's prompt caching apply to it.
+
+        Args:
+            intent (str): The user's intent (add, edit)
+
+        Returns:
+            str: Validation prompt for the specific intent
+        """
+        intent = intent.lower()
+        key = (intent, self._java_classes_digest)
+        with _VALIDATION_PROMPT_CACHE_LOCK:
+            prompt = _VALIDATION_PROMPT_CACHE.get(key)
+        if prompt is None:
+            prompt = self._build_validation_prompt(intent)
+            with _VALIDATION_PROMPT_CACHE_LOCK:
+                _VALIDATION_PROMPT_CACHE[key] = prompt
+        return prompt
+
+    def _build_validation_prompt(self, intent):
+        """
+        Build the validation prompt for an intent.
+
         Args:
             intent (str): The user's intent (add, edit)
 
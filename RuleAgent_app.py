@@ -1,10 +1,10 @@
-import os
 from dotenv import load_dotenv
 import streamlit as st
 from logger_utils import logger, log_operation
 from src.chat_session import ChatSession, ChatSessionManager
 from datetime import datetime
 from DroolsLLMAgent_updated import DroolsLLMAgent
+from utils.settings import get_settings
 
 
 # Load environment variables
@@ -12,7 +12,8 @@ logger.info("Loading environment variables in RuleAgent_app.py...")
 load_dotenv()
 
 # Log environment status
-logger.debug("Environment check - OPENAI_API_KEY exists: %s", "Yes" if os.getenv("OPENAI_API_KEY") else "No")
+settings = get_settings()
+logger.debug("Environment check - OPENAI_API_KEY exists: %s", "Yes" if settings.openai_api_key else "No")
 
 # Initialize session manager
 if 'session_manager' not in st.session_state:
@@ -20,7 +21,7 @@ if 'session_manager' not in st.session_state:
 
 # Initialize the Drools LLM Agent in session state
 if 'agent' not in st.session_state:
-    openai_key = os.getenv("OPENAI_API_KEY")
+    openai_key = settings.openai_api_key
     if not openai_key:
         error_msg = "OPENAI_API_KEY environment variable not set"
         logger.error(error_msg)
@@ -29,17 +30,11 @@ if 'agent' not in st.session_state:
     
     logger.info("Initializing DroolsLLMAgent")
     try:
-        # Get Java directory from environment variable
-        java_dir = os.getenv("JAVA_DIR", "")
-        
-        # Get rules directory from environment variable or use default
-        rules_dir = os.getenv("RULES_DIR", os.path.join(os.getcwd(), "rules"))
-        
-        # Initialize agent with directories
+        # Initialize agent with directories from the settings
         st.session_state.agent = DroolsLLMAgent(
             api_key=openai_key,
-            rules_dir=rules_dir,
-            java_dir=java_dir
+            rules_dir=settings.rules_dir,
+            java_dir=settings.java_dir
         )
         logger.info("DroolsLLMAgent initialized successfully")
         log_operation('agent_initialization', {'status': 'success'})
@@ -53,10 +48,11 @@ if 'agent' not in st.session_state:
 def load_chat_session(session: ChatSession):
     """Load a chat session and sync it with the LLM agent's context."""
     st.session_state.current_session = session
-    # Reset agent's message history and add all messages from the session
-    st.session_state.agent.messages = []
-    for msg in session.messages:
-        st.session_state.agent.messages.append(msg)
+    # Resume the agent from its saved context; sessions saved before that was
+    # stored fall back to the visible transcript
+    st.session_state.agent.load_conversation(
+        session.agent_messages or session.messages
+    )
 
 # Initialize or load chat session
 if 'current_session' not in st.session_state:
@@ -70,7 +66,7 @@ with st.sidebar:
     if st.button("New Chat"):
         st.session_state.current_session = ChatSession()
         # Reset agent's message history
-        st.session_state.agent.messages = []
+        st.session_state.agent.load_conversation()
         st.rerun()
     
     # List existing sessions
@@ -95,6 +91,13 @@ with st.sidebar:
 st.title("🤖 Drools Rule Assistant")
 st.markdown("Interact with the agent to add, search, edit or delete Drools rules.")
 
+# Display chat history
+for msg in st.session_state.current_session.messages:
+    if msg["role"] == "user":
+        st.chat_message("user").write(msg["content"])
+    else:
+        st.chat_message("assistant").write(msg["content"])
+
 # Chat input
 user_input = st.chat_input("Type your message here...")
 if user_input:
@@ -102,11 +105,14 @@ if user_input:
     
     # Add message to current session
     st.session_state.current_session.add_message("user", user_input)
+    st.chat_message("user").write(user_input)
     
-    # Get assistant response with logging
+    # Stream the assistant response so it shows up as it is generated
     try:
         logger.debug("Processing user message with DroolsLLMAgent...")
-        assistant_reply = st.session_state.agent.handle_user_message(user_input)
+        assistant_reply = st.chat_message("assistant").write_stream(
+            st.session_state.agent.handle_user_message_stream(user_input)
+        )
         
         # Log successful interaction
         log_operation('agent_interaction', {
@@ -116,6 +122,9 @@ if user_input:
         
         # Add assistant reply to session
         st.session_state.current_session.add_message("assistant", assistant_reply)
+        st.session_state.current_session.agent_messages = (
+            st.session_state.agent.export_conversation()
+        )
         
         # Save session after each interaction
         st.session_state.session_manager.save_session(st.session_state.current_session)
@@ -125,10 +134,3 @@ if user_input:
         logger.error(error_msg, exc_info=True)
         log_operation('agent_interaction', {'user_input': user_input}, error=e)
         st.error(f"🔴 {error_msg}")
-
-# Display chat history
-for msg in st.session_state.current_session.messages:
-    if msg["role"] == "user":
-        st.chat_message("user").write(msg["content"])
-    else:
-        st.chat_message("assistant").write(msg["content"])
@@ -7,8 +7,7 @@ and Guided Decision Table (GDST) files.
 
 import os
 import re
-import json
-import xml.dom.minidom as minidom
+import orjson
 import xml.etree.ElementTree as ET
 from typing import Dict, List, Any, Optional, Tuple
 from logger_utils import logger
@@ -98,7 +97,7 @@ class JsonToDrlConverter:
         
         # Save to file
         file_path = os.path.join(output_dir, f"{filename}.drl")
-        with open(file_path, "w") as f:
+        with open(file_path, "w", encoding="utf-8") as f:
             f.write(drl_content)
         
         return file_path
@@ -130,6 +129,25 @@ class JsonToGdstConverter:
         Returns:
             String containing the formatted XML
         """
+        self._build_tree()
+        return ET.tostring(self.root, encoding="unicode", method="xml")
+    
+    def write(self, file_path: str) -> None:
+        """
+        Convert JSON to GDST XML and write it straight to a file.
+        
+        The tree is serialized directly into the file, without building the
+        whole document as a string first.
+        
+        Args:
+            file_path (str): Path of the .gdst file to write
+        """
+        self._build_tree()
+        with open(file_path, "w", encoding="utf-8") as f:
+            ET.ElementTree(self.root).write(f, encoding="unicode", method="xml")
+    
+    def _build_tree(self):
+        """Generate the GDST XML tree and indent it for readability."""
         # Reset column structure and count
         self.column_structure = []
         self.column_count = 0
@@ -141,38 +159,8 @@ class JsonToGdstConverter:
         # Generate the XML structure
         self._generate_gdst_xml()
         
-        # Convert to string and format
-        xml_str = ET.tostring(self.root, encoding='utf-8', method='xml')
-        
-        # Format the XML
-        formatted_xml = self._format_xml(xml_str)
-        
-        return formatted_xml
-    
-    def _format_xml(self, xml_str: str) -> str:
-        """
-        Format XML for readability.
-        
-        Args:
-            xml_str (str): XML string
-            
-        Returns:
-            str: Formatted XML string
-        """
-        # Parse XML string
-        dom = minidom.parseString(xml_str)
-        
-        # Pretty print with 2-space indentation
-        pretty_xml = dom.toprettyxml(indent="  ")
-        
-        # Remove XML declaration from pretty_xml if it exists
-        if pretty_xml.startswith('<?xml'):
-            pretty_xml = pretty_xml[pretty_xml.find('?>')+2:].lstrip()
-        
-        # # Fix valueString tags to be non-self-closing
-        # pretty_xml = pretty_xml.replace("<valueString/>", "<valueString></valueString>")
-        
-        return pretty_xml
+        # Pretty print with 2-space indentation, in place on the tree
+        ET.indent(self.root, space="  ")
     
     def _generate_gdst_xml(self):
         """Generate the GDST XML structure."""
@@ -1014,13 +1002,9 @@ class JsonToGdstConverter:
         if not filename:
             filename = self.json_data.get("tableName", "unnamed_table").replace(" ", "_")
         
-        # Generate GDST content
-        gdst_content = self.convert()
-        
-        # Save to file
+        # Generate the GDST content straight into the file
         file_path = os.path.join(output_dir, f"{filename}.gdst")
-        with open(file_path, "w") as f:
-            f.write(gdst_content)
+        self.write(file_path)
         
         return file_path
 
@@ -1060,8 +1044,8 @@ if __name__ == "__main__":
     output_file = sys.argv[2]
     
     # Load JSON data
-    with open(input_file, "r") as f:
-        json_data = json.load(f)
+    with open(input_file, "rb") as f:
+        json_data = orjson.loads(f.read())
     
     # Determine output directory and filename
     output_dir = os.path.dirname(output_file)
@@ -2,7 +2,7 @@ import logging
 import os
 from datetime import datetime
 from typing import Optional, Any
-import json
+import orjson
 from functools import wraps
 import traceback
 
@@ -58,8 +58,11 @@ def log_operation(operation_type: str, details: Optional[dict] = None, error: Op
                 'traceback': traceback.format_exc()
             }
             
-        # Log as JSON for better structure
-        logger.info(json.dumps(log_entry, indent=2))
+        # Log as compact single-line JSON; values JSON can't encode are
+        # logged via str() instead of dropping the whole entry
+        logger.info(
+            orjson.dumps(log_entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        )
         
     except Exception as e:
         # Fallback logging if JSON serialization fails
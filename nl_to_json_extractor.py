@@ -13,11 +13,20 @@ Key features:
 6. Modular prompt structure for better maintainability
 """
 
-import os
 import re
-import json
+import hashlib
+import threading
+import orjson
 from typing import Dict, List, Any, Optional
-from openai import OpenAI
+from utils.openai_client import get_openai_client, log_prompt_cache_usage
+from utils.settings import get_settings
+from utils.parse_java_classes import format_java_classes
+
+# Extraction system prompts only depend on the rule type, the package and the
+# Java classes, which rarely change, so each combination is built once per
+# process. Keys hold a hash of the class map rather than the map itself.
+_SYSTEM_PROMPT_CACHE: Dict[tuple, str] = {}
+_SYSTEM_PROMPT_CACHE_LOCK = threading.Lock()
 
 class NLToJsonExtractor:
     """
@@ -32,9 +41,9 @@ class NLToJsonExtractor:
             api_key (str): OpenAI API key
             model (str): OpenAI model to use
         """
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.api_key = api_key or get_settings().openai_api_key
         self.model = model
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_openai_client(self.api_key)
         # self.package = os.environ.get("DROOLS_PACKAGE_NAME", "com.myspace.resopsrecomms")
         self.package = "com.myspace.resopsrecomms"
         print(f"Using package name: {self.package}")
@@ -128,7 +137,7 @@ class NLToJsonExtractor:
             dict: Structured JSON schema for DRL rule
         """
         # Prepare the system prompt for DRL extraction
-        system_prompt = self._create_drl_system_prompt(java_classes_map)
+        system_prompt = self._get_system_prompt("drl", java_classes_map)
         
         # Prepare the user prompt
         user_prompt = f"Extract the structured JSON schema for a DRL rule from this description: {user_input}"
@@ -142,13 +151,41 @@ class NLToJsonExtractor:
             ],
             response_format={"type": "json_object"}
         )
+        log_prompt_cache_usage(response, "extract_drl_json")
         
         # Extract and parse the JSON response
         json_str = response.choices[0].message.content
-        json_data = json.loads(json_str)
+        json_data = orjson.loads(json_str)
         
         return json_data
       
+    def _get_system_prompt(self, rule_type: str, java_classes_map: Dict[str, Dict] = None) -> str:
+        """
+        Get the extraction system prompt, building it only on a cache miss.
+        
+        Args:
+            rule_type (str): "drl" or "gdst"
+            java_classes_map (dict): Dictionary mapping class names to package, class name, and methods
+            
+        Returns:
+            str: System prompt for the rule type
+        """
+        classes_digest = hashlib.sha256(
+            orjson.dumps(java_classes_map or {}, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+        key = (rule_type, self.package, classes_digest)
+        
+        with _SYSTEM_PROMPT_CACHE_LOCK:
+            system_prompt = _SYSTEM_PROMPT_CACHE.get(key)
+        if system_prompt is None:
+            if rule_type == "drl":
+                system_prompt = self._create_drl_system_prompt(java_classes_map)
+            else:
+                system_prompt = self._create_gdst_system_prompt(java_classes_map)
+            with _SYSTEM_PROMPT_CACHE_LOCK:
+                _SYSTEM_PROMPT_CACHE[key] = system_prompt
+        return system_prompt
+      
     def _create_drl_system_prompt(self, java_classes_map: Dict[str, Dict] = None) -> str:
         """
         Create the system prompt for DRL extraction.
@@ -188,27 +225,12 @@ IMPORTANT GUIDELINES:
 6. Format conditions and actions as valid Drools drl syntax
 7. Return ONLY the JSON object, nothing else
 """
-        java_classes_prompt = "\n\n**Java Class Information:**\n"
-        java_classes_prompt += "You have access to the following Java class definitions:\n"
-        
-        for class_name, class_info in java_classes_map.items():
-            package = class_info.get("package", "")
-            methods = class_info.get("methods", [])
-            fields = class_info.get("fields", [])
-            
-            java_classes_prompt += f"\nClass: {class_name}\n"
-            java_classes_prompt += f"Package: {package}\n"
-            
-            if fields:
-                java_classes_prompt += "Fields:\n"
-                for field in fields:
-                    java_classes_prompt += f"- {field}\n"
-            
-            if methods:
-                java_classes_prompt += "Methods:\n"
-                for method in methods:
-                    java_classes_prompt += f"- {method}\n"
-        
+        java_classes_prompt = (
+            "\n\n**Java Class Information:**\n"
+            "You have access to the following Java class definitions "
+            "(one class per line):\n"
+            + format_java_classes(java_classes_map)
+        )
         java_classes_prompt += "\n**IMPORTANT INSTRUCTIONS FOR JAVA CLASSES:**\n"
         java_classes_prompt += "1. Use the correct package names for imports based on the Java class definitions\n"
         java_classes_prompt += "2. When writing conditions and actions, select the appropriate Java-bean properties and methods based on the user's intent:\n"
@@ -315,7 +337,7 @@ Your response should be:
             dict: Structured JSON schema for GDST rule
         """
         # Prepare the system prompt for GDST extraction using the modular approach
-        system_prompt = self._create_gdst_system_prompt(java_classes_map)
+        system_prompt = self._get_system_prompt("gdst", java_classes_map)
         
         # Prepare the user prompt
         user_prompt = f"Extract the structured JSON schema for a GDST rule from this description: {user_input}"
@@ -329,11 +351,12 @@ Your response should be:
             ],
             response_format={"type": "json_object"}
         )
+        log_prompt_cache_usage(response, "extract_gdst_json")
         
         # Extract and parse the JSON response
         json_str = response.choices[0].message.content
         try:
-            json_data = json.loads(json_str)
+            json_data = orjson.loads(json_str)
             
             # # Fix key naming if needed - ensure conditionsBRL is used instead of conditionPatterns
             # if "conditionPatterns" in json_data and "conditionsBRL" not in json_data:
@@ -366,7 +389,7 @@ Your response should be:
                 
             return json_data
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"Error decoding JSON from LLM: {e}")
             print(f"Received content: {json_str}")
             # Return an empty dict or raise an error, depending on desired handling
@@ -1484,27 +1507,12 @@ If you do have a FreeFormLine/EVAL for "even dailySales," insert it just before
         Returns:
             str: Prompt section for Java classes
         """
-        java_classes_prompt = "\n\n**Java Class Information:**\n"
-        java_classes_prompt += "You have access to the following Java class definitions:\n"
-        
-        for class_name, class_info in java_classes_map.items():
-            package = class_info.get("package", "")
-            methods = class_info.get("methods", [])
-            fields = class_info.get("fields", [])
-            
-            java_classes_prompt += f"\nClass: {class_name}\n"
-            java_classes_prompt += f"Package: {package}\n"
-            
-            if fields:
-                java_classes_prompt += "Fields:\n"
-                for field in fields:
-                    java_classes_prompt += f"- {field}\n"
-            
-            if methods:
-                java_classes_prompt += "Methods:\n"
-                for method in methods:
-                    java_classes_prompt += f"- {method}\n"
-        
+        java_classes_prompt = (
+            "\n\n**Java Class Information:**\n"
+            "You have access to the following Java class definitions "
+            "(one class per line):\n"
+            + format_java_classes(java_classes_map)
+        )
         java_classes_prompt += "\n**IMPORTANT INSTRUCTIONS FOR JAVA CLASSES:**\n"
         java_classes_prompt += "1. Use the correct package names for imports based on the Java class definitions\n"
         java_classes_prompt += "2. When writing actions, select the appropriate method based on the user's intent:\n"
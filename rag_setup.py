@@ -9,26 +9,131 @@
 # 6. Verifies the index by running a sample similarity query.
 
 import os
-import json
+import time
 import argparse
+import functools
+import threading
 from openai import OpenAI
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchAny,
     PointStruct,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
 )
 from dotenv import load_dotenv
 import uuid
 import numpy as np
+from utils.settings import get_settings
 
 # --------------- Configuration ---------------
 # Environment variables:
 #   OPENAI_API_KEY   - your OpenAI API key
 #   QDRANT_URL       - your Qdrant Cloud REST endpoint (e.g. https://<..>.us-qdrant.cloud)
 #   QDRANT_API_KEY   - your Qdrant Cloud API key
+#   QDRANT_PREFER_GRPC - use gRPC instead of REST (default "true")
+#   QDRANT_GRPC_PORT - gRPC port of the Qdrant server (default 6334)
 # Constants:
 COLLECTION_NAME = "rule-master-dev"
-EMBEDDING_MODEL = "text-embedding-3-large"  # OpenAI embedding model
-VECTOR_SIZE = 3072  # Dimension of the chosen embedding model
+# The OpenAI embedding model and output size come from EMBEDDING_MODEL and
+# EMBEDDING_DIMENSIONS. text-embedding-3 models can return shortened vectors
+# (e.g. text-embedding-3-small at 512 dimensions), which cuts request
+# payloads, Qdrant RAM and search time. Changing either value needs a
+# collection created with the new size and the rules reindexed.
+
+# Vectors are kept in RAM as int8 with the float32 originals on disk; searches
+# oversample the quantized candidates and rescore them at full precision.
+# The rules corpus is small, so a narrow HNSW beam (QDRANT_SEARCH_HNSW_EF)
+# keeps recall for the top 5 while traversing far fewer candidates than the
+# default.
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+)
+
+
+def get_search_params() -> SearchParams:
+    """
+    Build the search parameters for rule queries from the current settings.
+
+    Returns:
+        SearchParams: HNSW beam width and quantized search with rescoring
+    """
+    return SearchParams(
+        hnsw_ef=get_settings().qdrant_search_hnsw_ef,
+        exact=False,
+        quantization=QuantizationSearchParams(rescore=True, oversampling=2.0),
+    )
+
+
+# Collections practically never change while the process runs, so the list
+# from Qdrant is cached instead of being fetched before every operation
+COLLECTIONS_CACHE_TTL = 60  # seconds
+_collections_cache = None
+_collections_cache_ts = 0.0
+_collections_cache_lock = threading.Lock()
+
+
+def collection_exists(
+    qdrant_client: QdrantClient, name: str, ttl: float = COLLECTIONS_CACHE_TTL
+) -> bool:
+    """
+    Check whether a collection exists, using a cached collection list.
+
+    Args:
+        qdrant_client (QdrantClient): Qdrant client instance
+        name (str): Name of the collection
+        ttl (float): Seconds before the cached collection list is refreshed
+
+    Returns:
+        bool: True if the collection exists
+    """
+    global _collections_cache, _collections_cache_ts
+    with _collections_cache_lock:
+        if _collections_cache is None or time.monotonic() - _collections_cache_ts > ttl:
+            response = qdrant_client.get_collections()
+            _collections_cache = {c.name for c in response.collections}
+            _collections_cache_ts = time.monotonic()
+        return name in _collections_cache
+
+
+def invalidate_collections_cache():
+    """Drop the cached collection list so the next check asks Qdrant again."""
+    global _collections_cache
+    with _collections_cache_lock:
+        _collections_cache = None
+
+
+def ensure_collection(qdrant_client: QdrantClient, name: str):
+    """
+    Create the collection if it doesn't exist yet.
+
+    Args:
+        qdrant_client (QdrantClient): Qdrant client instance
+        name (str): Name of the collection
+    """
+    if collection_exists(qdrant_client, name):
+        return
+
+    print(f"Creating collection {name}")
+    qdrant_client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(
+            size=get_settings().embedding_dimensions,
+            distance=Distance.COSINE,
+            on_disk=True,
+        ),
+        quantization_config=QUANTIZATION_CONFIG,
+    )
+    with _collections_cache_lock:
+        if _collections_cache is not None:
+            _collections_cache.add(name)
 
 
 def parse_args():
@@ -41,6 +146,11 @@ def parse_args():
     parser.add_argument(
         "--apply", action="store_true", help="Apply the changes (delete and reindex)"
     )
+    parser.add_argument(
+        "--enable-quantization",
+        action="store_true",
+        help=f"Switch the existing {COLLECTION_NAME} collection to scalar quantization",
+    )
     return parser.parse_args()
 
 
@@ -66,6 +176,108 @@ def parse_args():
 #     return mapping.get(filename, filename)
 
 
+def _qdrant_connection_settings() -> dict:
+    """
+    Connection settings shared by the sync and async Qdrant clients.
+
+    gRPC is preferred because query vectors travel as packed float32
+    protobuf rather than JSON; set QDRANT_PREFER_GRPC=false where the gRPC
+    port isn't reachable.
+
+    Returns:
+        dict: Keyword arguments for QdrantClient / AsyncQdrantClient
+    """
+    settings = get_settings()
+    return {
+        "url": settings.qdrant_url,
+        "api_key": settings.qdrant_api_key,
+        "prefer_grpc": settings.qdrant_prefer_grpc,
+        "grpc_port": settings.qdrant_grpc_port,
+        "timeout": 10,
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def get_qdrant_client() -> QdrantClient:
+    """
+    Return the process-wide Qdrant client.
+
+    Reusing one client keeps its connection pool alive instead of paying a
+    new TCP/TLS handshake for every search, edit, delete and index call.
+
+    Returns:
+        QdrantClient: Shared Qdrant client instance
+    """
+    return QdrantClient(**_qdrant_connection_settings())
+
+
+@functools.lru_cache(maxsize=1)
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """
+    Return the process-wide async Qdrant client.
+
+    Like the shared AsyncOpenAI client, its connections belong to the event
+    loop that first uses it, so drive it from a single long-lived loop.
+
+    Returns:
+        AsyncQdrantClient: Shared async Qdrant client instance
+    """
+    return AsyncQdrantClient(**_qdrant_connection_settings())
+
+
+def enable_quantization(qdrant_client: QdrantClient, name: str):
+    """
+    Switch an existing collection to int8 scalar quantization.
+
+    Collections created by ensure_collection are already quantized; this
+    upgrades ones that were created before.
+
+    Args:
+        qdrant_client (QdrantClient): Qdrant client instance
+        name (str): Name of the collection
+    """
+    qdrant_client.update_collection(
+        collection_name=name, quantization_config=QUANTIZATION_CONFIG
+    )
+    print(f"Enabled scalar quantization on collection {name}")
+
+
+@functools.lru_cache(maxsize=256)
+def filename_filter(*filenames: str) -> Filter:
+    """
+    Build a Qdrant filter matching points whose filesystem_filename is one of filenames.
+
+    Filters are cached so repeated lookups of the same rule reuse one
+    model instance instead of rebuilding it on every call.
+
+    Args:
+        *filenames (str): Accepted values of the filesystem_filename payload field
+
+    Returns:
+        Filter: Payload filter for scroll, search or delete calls
+    """
+    return Filter(
+        must=[
+            FieldCondition(
+                key="filesystem_filename", match=MatchAny(any=list(filenames))
+            )
+        ]
+    )
+
+
+def normalize_embedding_text(text: str) -> str:
+    """
+    Collapse runs of whitespace so layout doesn't cost embedding tokens.
+
+    Args:
+        text (str): Text to be embedded
+
+    Returns:
+        str: Text with single spaces between words
+    """
+    return " ".join(text.split())
+
+
 def embed_text(text: str, client: OpenAI = None) -> list:
     """
     Get embedding for text using OpenAI's embedding model.
@@ -77,19 +289,28 @@ def embed_text(text: str, client: OpenAI = None) -> list:
     Returns:
         list: Embedding vector
     """
+    text = normalize_embedding_text(text)
+    settings = get_settings()
     try:
         # Use provided client or fall back to global oai client
         client_to_use = client or oai
-        res = client_to_use.embeddings.create(input=text, model=EMBEDDING_MODEL)
+        res = client_to_use.embeddings.create(
+            input=text,
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions,
+        )
         return res.data[0].embedding
     except Exception:
         print("Falling back to chunked embedding…")
         max_chars = 8192 * 4
         chunks = [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
-        vecs = []
-        for chunk in chunks:
-            r = client_to_use.embeddings.create(input=chunk, model=EMBEDDING_MODEL)
-            vecs.append(r.data[0].embedding)  # ← must be append, never extend!
+        # embed every chunk in a single request instead of one round-trip each
+        r = client_to_use.embeddings.create(
+            input=chunks,
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions,
+        )
+        vecs = [item.embedding for item in r.data]
         # now average N × 1536 → one 1536 vector
 
         matrix = np.vstack(vecs)  # shape (N, 1536)
@@ -236,11 +457,9 @@ def index_new_rule(
         file_path (str): Path to the rule file
         refined_prompt (str): The refined user prompt (used for embedding)
     """
-    # Initialize Qdrant client
-    qdrant_client = QdrantClient(
-        url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-        api_key=os.getenv("QDRANT_API_KEY"),
-    )
+    qdrant_client = get_qdrant_client()
+
+    ensure_collection(qdrant_client, collection_name)
 
     # Create the embedding from the refined prompt (not rule content)
     emb = embed_text(refined_prompt, client)
@@ -272,3 +491,17 @@ def index_new_rule(
     print(
         f"Successfully indexed new rule {filesystem_filename} into collection {collection_name}"
     )
+
+
+def main():
+    args = parse_args()
+    if args.enable_quantization:
+        qdrant_client = get_qdrant_client()
+        if not collection_exists(qdrant_client, COLLECTION_NAME):
+            print(f"Collection {COLLECTION_NAME} does not exist; nothing to quantize")
+            return
+        enable_quantization(qdrant_client, COLLECTION_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import json
+import orjson
 import os
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -8,6 +8,9 @@ class ChatSession:
     def __init__(self, session_id: str = None):
         self.session_id = session_id or str(uuid.uuid4())
         self.messages: List[Dict] = []
+        # The agent's working context (compacted history, tool calls), kept so
+        # any process can resume the conversation where it left off
+        self.agent_messages: List[Dict] = []
         self.created_at = datetime.now().isoformat()
         self.updated_at = self.created_at
 
@@ -19,6 +22,7 @@ class ChatSession:
         return {
             "session_id": self.session_id,
             "messages": self.messages,
+            "agent_messages": self.agent_messages,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
@@ -27,6 +31,7 @@ class ChatSession:
     def from_dict(cls, data: Dict) -> 'ChatSession':
         session = cls(session_id=data["session_id"])
         session.messages = data["messages"]
+        session.agent_messages = data.get("agent_messages", [])
         session.created_at = data["created_at"]
         session.updated_at = data["updated_at"]
         return session
@@ -38,15 +43,15 @@ class ChatSessionManager:
 
     def save_session(self, session: ChatSession):
         file_path = os.path.join(self.storage_dir, f"{session.session_id}.json")
-        with open(file_path, 'w') as f:
-            json.dump(session.to_dict(), f, indent=2)
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(session.to_dict(), option=orjson.OPT_INDENT_2))
 
     def load_session(self, session_id: str) -> Optional[ChatSession]:
         file_path = os.path.join(self.storage_dir, f"{session_id}.json")
         if not os.path.exists(file_path):
             return None
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
             return ChatSession.from_dict(data)
 
     def list_sessions(self) -> List[Dict]:
@@ -54,8 +59,8 @@ class ChatSessionManager:
         for filename in os.listdir(self.storage_dir):
             if filename.endswith('.json'):
                 file_path = os.path.join(self.storage_dir, filename)
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
+                with open(file_path, 'rb') as f:
+                    data = orjson.loads(f.read())
                     sessions.append({
                         "session_id": data["session_id"],
                         "created_at": data["created_at"],
@@ -4,14 +4,27 @@ Rule management package for Drools rules.
 This package provides functionality for searching, deleting, and adding Drools rules.
 """
 
-from .search import search_rules, get_embedding
+from .search import (
+    search_rules,
+    search_rules_async,
+    get_embedding,
+    get_embeddings,
+    get_embeddings_async,
+    get_search_result_generation,
+    invalidate_search_results,
+)
 from .delete import delete_rule
 from .add import add_rule, save_json_to_file
 from .edit import edit_rule
 
 __all__ = [
     'search_rules',
+    'search_rules_async',
     'get_embedding',
+    'get_embeddings',
+    'get_embeddings_async',
+    'get_search_result_generation',
+    'invalidate_search_results',
     'delete_rule',
     'add_rule',
     'save_json_to_file',
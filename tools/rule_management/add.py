@@ -6,13 +6,16 @@ from natural language descriptions using the NL-to-JSON-to-Drools pipeline.
 """
 
 import os
-import json
+import orjson
 import datetime
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 from logger_utils import logger
-from openai import OpenAI
+from utils.openai_client import get_openai_client
+from utils.settings import get_settings
 from rag_setup import index_new_rule
+from .search import invalidate_search_results
 
 # Import the NL to JSON extractor
 from nl_to_json_extractor import NLToJsonExtractor
@@ -20,25 +23,8 @@ from nl_to_json_extractor import NLToJsonExtractor
 # Import the JSON to Drools converter
 from json_to_drools_converter import convert_json_to_drools
 
-def generate_file_name_with_llm(user_input: str, java_classes_map: Dict[str, Dict]) -> str:
-    """
-    Generate a file name using LLM based on the user input.
-    
-    Args:
-        user_input: The user's natural language description of the rule
-        java_classes_map: Dictionary mapping class names to package, class name, and methods
-        
-    Returns:
-        Generated file name
-    """
-    logger.info("Generating file name with LLM")
-    
-    # Initialize OpenAI client
-    api_key = os.environ.get("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    
-    # Create system prompt for file name generation
-    system_prompt = """You are a specialized AI that generates file names for Drools rules.
+# Static part of the file name generation prompt, shared by every call
+FILE_NAME_SYSTEM_PROMPT = """You are a specialized AI that generates file names for Drools rules.
 Your task is to create a file name based on the rule description following these guidelines:
 
 1. Use PascalCase (no spaces or punctuation).
@@ -54,15 +40,33 @@ Examples:
 
 Return ONLY the file name, nothing else.
 """
+
+def generate_file_name_with_llm(user_input: str, java_classes_map: Dict[str, Dict], default_name: str = "NewRule") -> str:
+    """
+    Generate a file name using LLM based on the user input.
+    
+    Args:
+        user_input: The user's natural language description of the rule
+        java_classes_map: Dictionary mapping class names to package, class name, and methods
+        default_name: File name to fall back to if the LLM call fails
+        
+    Returns:
+        Generated file name
+    """
+    logger.info("Generating file name with LLM")
     
-    # Add Java classes information to the system prompt
+    # Get the shared OpenAI client
+    client = get_openai_client(get_settings().openai_api_key)
+    
+    # Build the system prompt: the static instructions plus the class fields
+    system_prompt = FILE_NAME_SYSTEM_PROMPT
     if java_classes_map:
-        system_prompt += "\n\nAvailable Java classes and their fields:\n"
+        parts = [system_prompt, "\n\nAvailable Java classes and their fields:\n"]
         for class_name, class_info in java_classes_map.items():
             if "fields" in class_info:
-                system_prompt += f"\n{class_name} fields:\n"
-                for field in class_info["fields"]:
-                    system_prompt += f"- {field}\n"
+                parts.append(f"\n{class_name} fields:\n")
+                parts.extend(f"- {field}\n" for field in class_info["fields"])
+        system_prompt = "".join(parts)
     
     # Create user prompt with the user input
     user_prompt = f"Generate a file name for this Drools rule:\n\n{user_input}\n\nFile name:"
@@ -86,7 +90,6 @@ Return ONLY the file name, nothing else.
     except Exception as e:
         logger.error(f"Error generating file name: {str(e)}", exc_info=True)
         # Fallback to a default file name
-        default_name = "NewRule"
         logger.info(f"Using fallback file name: {default_name}")
         return default_name
 
@@ -124,8 +127,8 @@ def save_json_to_file(json_data: Dict[str, Any], output_dir: str, filename: str)
     
     # Save to file
     file_path = os.path.join(output_dir, f"{filename}.json")
-    with open(file_path, "w") as f:
-        json.dump(json_data, indent=2, fp=f)
+    with open(file_path, "wb") as f:
+        f.write(orjson.dumps(json_data, option=orjson.OPT_INDENT_2))
     
     logger.info(f"JSON saved to: {file_path}")
     return file_path
@@ -149,7 +152,7 @@ def save_prompt_to_file(prompt: str, prompt_dir: str, filename: str) -> str:
     
     # Save to file
     file_path = os.path.join(prompt_dir, f"{filename}.txt")
-    with open(file_path, "w") as f:
+    with open(file_path, "w", encoding="utf-8") as f:
         f.write(prompt)
     
     logger.info(f"Prompt saved to: {file_path}")
@@ -169,32 +172,39 @@ def add_rule(user_input: str, java_classes_map: Dict[str, Dict]) -> Dict[str, An
     logger.info(f"Starting add operation with user input: {user_input}")
     
     # Get API key from environment variables
-    api_key = os.environ.get("OPENAI_API_KEY")
+    settings = get_settings()
+    api_key = settings.openai_api_key
     
     # Get directories from environment variables
-    rules_directory = os.environ.get("RULES_DIRECTORY", "./rules/active_rules")
-    rules_prompt_directory = os.environ.get("RULES_PROMPT_DIRECTORY", "./rules/active_rules_prompt")
+    rules_directory = settings.rules_directory
+    rules_prompt_directory = settings.rules_prompt_directory
     
     logger.info(f"API key: {api_key}")
     logger.info(f"Rules directory: {rules_directory}")
     logger.info(f"Rules prompt directory: {rules_prompt_directory}")
     
     try:
-        # Generate file name with LLM
-        file_name = generate_file_name_with_llm(user_input, java_classes_map)
-        
         # Initialize the NL to JSON extractor
         logger.info("Initializing NL to JSON extractor")
         extractor = NLToJsonExtractor(api_key=api_key)
         
-        # Detect rule type
-        logger.info("Detecting rule type")
-        rule_type = extractor.detect_rule_type(user_input)
-        logger.info(f"Detected rule type: {rule_type}")
-        
-        # Extract JSON schema from natural language
-        logger.info("Extracting JSON schema from natural language")
-        json_schema = extractor.extract_to_json(user_input, rule_type, java_classes_map)
+        # The file name doesn't depend on the extraction, so generate it with
+        # the LLM in the background while the rule type and JSON are extracted
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            file_name_future = executor.submit(
+                generate_file_name_with_llm, user_input, java_classes_map
+            )
+            
+            # Detect rule type
+            logger.info("Detecting rule type")
+            rule_type = extractor.detect_rule_type(user_input)
+            logger.info(f"Detected rule type: {rule_type}")
+            
+            # Extract JSON schema from natural language
+            logger.info("Extracting JSON schema from natural language")
+            json_schema = extractor.extract_to_json(user_input, rule_type, java_classes_map)
+            
+            file_name = file_name_future.result()
         
         # Update table name or rule name with the base file name
         if rule_type == "gdst":
@@ -223,8 +233,8 @@ def add_rule(user_input: str, java_classes_map: Dict[str, Dict]) -> Dict[str, An
         
         logger.info(f"Add operation completed successfully for rule: {rule_name}")
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Get the shared OpenAI client
+        client = get_openai_client(api_key)
 
         # Index the new rule
         collection_name = "rule-master-dev"
@@ -234,6 +244,7 @@ def add_rule(user_input: str, java_classes_map: Dict[str, Dict]) -> Dict[str, An
             file_path=output_path,
             refined_prompt=user_input
         )
+        invalidate_search_results()
         
         # Return success response
         return {
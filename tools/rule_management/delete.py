@@ -5,12 +5,50 @@ This module provides functionality to delete rules from both the filesystem and
 """
 
 import os
-import shutil
-import datetime
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, List
 from logger_utils import logger, log_decorator
-from .search import search_rules
-from qdrant_client import QdrantClient
+from .search import SEARCH_PAYLOAD_FIELDS, invalidate_search_results, search_rules
+from .edit import version_file
+from qdrant_client.models import FilterSelector
+from rag_setup import filename_filter, get_qdrant_client
+from utils.settings import get_settings
+
+def find_rule_by_filename(rule_name: str) -> List[Dict[str, Any]]:
+    """
+    Look a rule up in Qdrant by its exact file name, without embedding it.
+
+    Args:
+        rule_name (str): Rule file name, with or without a .gdst/.drl extension
+
+    Returns:
+        list: The matching rule in search result format, or an empty list
+    """
+    base_name = os.path.splitext(rule_name.strip().replace(" ", "_"))[0]
+    if not base_name:
+        return []
+    try:
+        points, _ = get_qdrant_client().scroll(
+            collection_name="rule-master-dev",
+            scroll_filter=filename_filter(
+                rule_name.strip(), f"{base_name}.gdst", f"{base_name}.drl"
+            ),
+            limit=1,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=False
+        )
+    except Exception as e:
+        logger.warning(f"Exact filename lookup failed for {rule_name}: {str(e)}")
+        return []
+    
+    return [
+        {
+            "filesystem_filename": point.payload["filesystem_filename"].replace(" ", "_"),
+            "refined_prompt": point.payload.get("refined_prompt", ""),
+            "relevance_score": 1.0
+        }
+        for point in points
+    ]
 
 @log_decorator("delete_rule")
 def delete_rule(
@@ -35,10 +73,11 @@ def delete_rule(
     try:
         logger.info(f"Starting delete rule: {rule_name}")
     
-        rules_directory = os.environ.get("RULES_DIRECTORY", "./rules/active_rules")
-        old_rules_directory = os.environ.get("OLD_RULES_DIRECTORY", "./rules/old_rules")
-        rules_prompt_directory = os.environ.get("RULES_PROMPT_DIRECTORY", "./rules/active_rules_prompt")
-        old_rules_prompt_directory = os.environ.get("OLD_RULES_PROMPT_DIRECTORY", "./rules/old_rules_prompt")
+        settings = get_settings()
+        rules_directory = settings.rules_directory
+        old_rules_directory = settings.old_rules_directory
+        rules_prompt_directory = settings.rules_prompt_directory
+        old_rules_prompt_directory = settings.old_rules_prompt_directory
         
         logger.info(f"Using rules directory: {rules_directory}")
         logger.info(f"Using old rules directory: {old_rules_directory}")
@@ -51,16 +90,19 @@ def delete_rule(
         os.makedirs(rules_prompt_directory, exist_ok=True)
         os.makedirs(old_rules_prompt_directory, exist_ok=True)
         
-        # Use provided search results or search for the rule
-        search_results = search_rules(rule_name, api_key=api_key)
-        logger.info(f"Raw search results: {search_results}")
-        
-        # Extract results from the nested structure
-        results = search_results.get("results", [])
-        logger.info(f"Extracted results: {results}")
+        # Rule names normally come straight from search results, so try an
+        # exact filename lookup first and only fall back to semantic search
+        results = find_rule_by_filename(rule_name)
+        if not results:
+            search_results = search_rules(rule_name, api_key=api_key)
+            logger.debug("Raw search results: %s", search_results)
+            
+            # Extract results from the nested structure
+            results = search_results.get("results", [])
+        logger.debug("Extracted results: %s", results)
         
         if not results:
-            logger.warning(f"No results found in search_results: {search_results}")
+            logger.warning(f"No results found for: {rule_name}")
             return {
                 "success": False,
                 "message": f"Could not find any rules matching '{rule_name}'. Please check the rule name and try again."
@@ -73,11 +115,9 @@ def delete_rule(
         # Find the matching rule by base name
         matching_rule = None
         for result in results:
-            logger.info(f"Checking result: {result}")
             # Get the filesystem name and remove extension for comparison
             result_filename = result.get("filesystem_filename", "")
             result_base_name = os.path.splitext(result_filename)[0]
-            logger.info(f"Comparing {rule_base_name} with {result_base_name}")
             if result_base_name.lower() == rule_base_name.lower():
                 matching_rule = result
                 logger.info(f"Found matching rule: {matching_rule}")
@@ -99,41 +139,19 @@ def delete_rule(
         
         moved_files = []
         
-        # Move GDST file to old_rules_directory (same pattern as edit.py)
-        gdst_path = os.path.join(rules_directory, f"{base_name}.gdst")
-        if os.path.exists(gdst_path):
-            # Use version_file pattern but with old directory
-            ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-            dest_gdst = os.path.join(old_rules_directory, f"{base_name}_{ts}.gdst")
-            shutil.move(gdst_path, dest_gdst)
-            moved_files.append(f"{base_name}.gdst")
-            logger.info(f"Moved GDST file from {gdst_path} to {dest_gdst}")
-        else:
-            logger.warning(f"GDST file not found at: {gdst_path}")
-        
-        # Move JSON file to old_rules_directory (same pattern as edit.py)
-        json_path = os.path.join(rules_directory, f"{base_name}.json")
-        if os.path.exists(json_path):
-            # Use version_file pattern but with old directory
-            ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-            dest_json = os.path.join(old_rules_directory, f"{base_name}_{ts}.json")
-            shutil.move(json_path, dest_json)
-            moved_files.append(f"{base_name}.json")
-            logger.info(f"Moved JSON file from {json_path} to {dest_json}")
-        else:
-            logger.warning(f"JSON file not found at: {json_path}")
-        
-        # Move prompt file to old_rules_prompt_directory (same pattern as edit.py)
-        prompt_path = os.path.join(rules_prompt_directory, f"{base_name}.txt")
-        if os.path.exists(prompt_path):
-            # Use version_file pattern but with old directory
-            ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-            dest_prompt = os.path.join(old_rules_prompt_directory, f"{base_name}_{ts}.txt")
-            shutil.move(prompt_path, dest_prompt)
-            moved_files.append(f"{base_name}.txt")
-            logger.info(f"Moved prompt file from {prompt_path} to {dest_prompt}")
-        else:
-            logger.warning(f"Prompt file not found at: {prompt_path}")
+        # Archive the rule's files with a timestamp suffix, as edit.py does
+        for label, directory, archive_dir, extension in (
+            ("GDST", rules_directory, old_rules_directory, "gdst"),
+            ("JSON", rules_directory, old_rules_directory, "json"),
+            ("Prompt", rules_prompt_directory, old_rules_prompt_directory, "txt"),
+        ):
+            path = os.path.join(directory, f"{base_name}.{extension}")
+            dest = version_file(Path(path), Path(archive_dir))
+            if dest:
+                moved_files.append(f"{base_name}.{extension}")
+                logger.info(f"Moved {label} file from {path} to {dest}")
+            else:
+                logger.warning(f"{label} file not found at: {path}")
 
         if not moved_files:
             logger.warning(f"No files found to move for rule: {matching_rule['filesystem_filename']}")
@@ -144,35 +162,17 @@ def delete_rule(
 
         # Delete the rule from Qdrant
         try:
-            qdrant_client = QdrantClient(
-                url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-                api_key=os.getenv("QDRANT_API_KEY"),
-            )
+            qdrant_client = get_qdrant_client()
             
-            # First search for the point using a payload filter
-            search_result = qdrant_client.scroll(
+            # Delete every point for the file with a single filtered call
+            qdrant_client.delete(
                 collection_name="rule-master-dev",
-                limit=100,  # Get a reasonable number of points
-                with_payload=True,
-                with_vectors=False
-            )
-            
-            # Find the point with matching filename
-            point_id = None
-            for point in search_result[0]:
-                if point.payload.get("filesystem_filename") == matching_rule["filesystem_filename"]:
-                    point_id = point.id
-                    break
-            
-            if point_id is not None:
-                # Delete using the point ID
-                qdrant_client.delete(
-                    collection_name="rule-master-dev",
-                    points_selector=[point_id]
+                points_selector=FilterSelector(
+                    filter=filename_filter(matching_rule["filesystem_filename"])
                 )
-                logger.info(f"Deleted rule from Qdrant: {matching_rule['filesystem_filename']}")
-            else:
-                logger.warning(f"No matching point found in Qdrant for {matching_rule['filesystem_filename']}")
+            )
+            logger.info(f"Deleted rule from Qdrant: {matching_rule['filesystem_filename']}")
+            invalidate_search_results()
             
         except Exception as e:
             logger.error(f"Error deleting from Qdrant: {str(e)}")
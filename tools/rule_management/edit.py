@@ -6,16 +6,19 @@ from natural language descriptions using the NL-to-JSON-to-Drools pipeline.
 """
 
 import os
-import json
+import errno
+import orjson
 import shutil
 import datetime
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List, Tuple
 from logger_utils import logger
-from openai import OpenAI
-from rag_setup import index_new_rule
+from utils.openai_client import get_openai_client
+from utils.settings import get_settings
+from rag_setup import index_new_rule, filename_filter, get_qdrant_client
 from pathlib import Path
-from qdrant_client import QdrantClient
+from qdrant_client.models import FilterSelector
 
 
 # Import the NL to JSON extractor
@@ -24,6 +27,28 @@ from nl_to_json_extractor import NLToJsonExtractor
 # Import the JSON to Drools converter
 from json_to_drools_converter import convert_json_to_drools
 
+# File names follow the same convention as newly added rules
+from .add import generate_file_name_with_llm
+from .search import invalidate_search_results
+
+def _check_rule_file_name(file_name: str, directory: str) -> None:
+    """
+    Reject rule names that can't name a file directly inside a rules directory.
+
+    Rule names come from the LLM, so a hallucinated path fails here without
+    any filesystem calls.
+
+    Args:
+        file_name: Name of the rule file
+        directory: Directory the file is looked up in
+
+    Raises:
+        FileNotFoundError: If the name is empty or contains a path component
+    """
+    if not file_name or file_name in (".", "..") or os.path.basename(file_name) != file_name:
+        logger.error(f"Invalid rule file name: {file_name}")
+        raise FileNotFoundError(f"Rule file {file_name} not found in {directory}")
+
 def find_json_file(rules_directory: str, file_name: str) -> str:
     """
     Find the JSON file in the rules directory based on the file name.
@@ -36,6 +61,7 @@ def find_json_file(rules_directory: str, file_name: str) -> str:
         Path to the JSON file
     """
     logger.info(f"Looking for JSON file for {file_name} in {rules_directory}")
+    _check_rule_file_name(file_name, rules_directory)
     
     # If file_name already ends with .json, use it directly
     if file_name.lower().endswith('.json'):
@@ -99,6 +125,7 @@ def find_prompt_file(rules_prompt_directory: str, file_name: str) -> str:
         Path to the prompt file
     """
     logger.info(f"Looking for prompt file for {file_name} in {rules_prompt_directory}")
+    _check_rule_file_name(file_name, rules_prompt_directory)
     
     # Get the base name without extension
     base_name = os.path.splitext(file_name)[0]
@@ -119,25 +146,8 @@ def find_prompt_file(rules_prompt_directory: str, file_name: str) -> str:
     logger.error(f"Prompt file for {file_name} not found in {rules_prompt_directory}")
     raise FileNotFoundError(f"Prompt file for {file_name} not found in {rules_prompt_directory}")
 
-def create_consolidated_update_prompt(original_prompt: str, update_input: str) -> str:
-    """
-    Create a consolidated update prompt by combining the original prompt and the update input.
-    
-    Args:
-        original_prompt: The original prompt generated from the JSON
-        update_input: The user's update input
-        
-    Returns:
-        Consolidated update prompt
-    """
-    logger.info("Creating consolidated update prompt")
-    
-    # Initialize OpenAI client
-    api_key = os.environ.get("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    
-    # Create system prompt for consolidating the prompts
-    system_prompt = """You are a Drools rule assistant that works entirely in plain English.
+# System prompt for merging an update instruction into a rule description
+CONSOLIDATE_SYSTEM_PROMPT = """You are a Drools rule assistant that works entirely in plain English.
 
 Your task: given  
   1. an **original rule description** in natural language, and  
@@ -169,6 +179,22 @@ _Example B_
 - **Output:**  
   "Create a rule named HolidayStaffing that adds 3 extra employees for holiday hours, and adds 2 extra employees for weekend hours. Salience is 60."
 """
+
+def create_consolidated_update_prompt(original_prompt: str, update_input: str) -> str:
+    """
+    Create a consolidated update prompt by combining the original prompt and the update input.
+    
+    Args:
+        original_prompt: The original prompt generated from the JSON
+        update_input: The user's update input
+        
+    Returns:
+        Consolidated update prompt
+    """
+    logger.info("Creating consolidated update prompt")
+    
+    # Get the shared OpenAI client
+    client = get_openai_client(get_settings().openai_api_key)
     
     # Create user prompt with the original prompt and update input
     user_prompt = f"""Original rule description:
@@ -185,7 +211,7 @@ Create a consolidated prompt that incorporates the original rule and the request
         response = client.chat.completions.create(
             model="gpt-4o-mini",  # Using the same model as in NLToJsonExtractor
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": CONSOLIDATE_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ]
         )
@@ -199,88 +225,23 @@ Create a consolidated prompt that incorporates the original rule and the request
         logger.error(f"Error creating consolidated update prompt: {str(e)}", exc_info=True)
         raise Exception(f"Error creating consolidated update prompt: {str(e)}")
 
-def generate_file_name_with_llm(updated_prompt: str, java_classes_map: Dict[str, Dict]) -> str:
-    """
-    Generate a file name using LLM based on the updated prompt.
-    
-    Args:
-        updated_prompt: The consolidated update prompt
-        java_classes_map: Dictionary mapping class names to package, class name, and methods
-        
-    Returns:
-        Generated file name
-    """
-    logger.info("Generating file name with LLM")
-    
-    # Initialize OpenAI client
-    api_key = os.environ.get("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    
-    # Create system prompt for file name generation
-    system_prompt = """You are a specialized AI that generates file names for Drools rules.
-Your task is to create a file name based on the rule description following these guidelines:
-
-1. Use PascalCase (no spaces or punctuation).
-2. Start with the action (verb + object), e.g. AssignExtraEmployees.
-3. Then add By followed by the field names (the Java-bean property names) used in your conditions, joined with And.
-4. Format: <ActionVerb><Object>By<FieldName1>And<FieldName2>
-5. If there's only one field, omit the And….
-6. Always convert each field name to PascalCase.
-
-Examples:
-* Conditions on timeSlotExpectedSales only: "AssignExtraEmployeesByTimeSlotExpectedSales"
-* Conditions on both restaurantSize and dayOfWeek: "SetEmployeesCountByRestaurantSizeAndDayOfWeek"
-
-Return ONLY the file name, nothing else.
-"""
-    
-    # Add Java classes information to the system prompt
-    if java_classes_map:
-        system_prompt += "\n\nAvailable Java classes and their fields:\n"
-        for class_name, class_info in java_classes_map.items():
-            if "fields" in class_info:
-                system_prompt += f"\n{class_name} fields:\n"
-                for field in class_info["fields"]:
-                    system_prompt += f"- {field}\n"
-    
-    # Create user prompt with the updated prompt
-    user_prompt = f"Generate a file name for this Drools rule:\n\n{updated_prompt}\n\nFile name:"
-    
-    # Call the OpenAI API
-    try:
-        logger.info("Calling OpenAI API to generate file name")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Using the same model as in NLToJsonExtractor
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
-        # Extract the generated file name
-        file_name = response.choices[0].message.content.strip()
-        logger.info(f"Generated file name: {file_name}")
-        return file_name
-        
-    except Exception as e:
-        logger.error(f"Error generating file name: {str(e)}", exc_info=True)
-        # Fallback to a default file name
-        default_name = "UpdatedRule"
-        logger.info(f"Using fallback file name: {default_name}")
-        return default_name
-    
 def version_file(src: Path, archive_dir: Path) -> Optional[Path]:
     """
     Move src into archive_dir, renaming it with a timestamp suffix.
     Returns the archive path, or None if src didn't exist.
     """
-    if not src.exists():
-        logger.debug(f"No file to archive at {src}")
-        return None
-
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M")
     dest = archive_dir / f"{src.stem}_{ts}{src.suffix}"
-    shutil.move(str(src), str(dest))
+    try:
+        # A single rename when both directories are on the same filesystem
+        os.replace(src, dest)
+    except FileNotFoundError:
+        logger.debug(f"No file to archive at {src}")
+        return None
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dest))
     logger.info(f"old version moved {src.name} → {dest}")
     return dest
 
@@ -300,13 +261,14 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
     logger.info(f"User input: {user_input}")
     
     # Get API key from environment variables
-    api_key = os.environ.get("OPENAI_API_KEY")
+    settings = get_settings()
+    api_key = settings.openai_api_key
     
     # Get directories from environment variables
-    rules_directory = os.environ.get("RULES_DIRECTORY", "./rules/active_rules")
-    old_rules_directory = os.environ.get("OLD_RULES_DIRECTORY", "./rules/old_rules")
-    rules_prompt_directory = os.environ.get("RULES_PROMPT_DIRECTORY", "./rules/active_rules_prompt")
-    old_rules_prompt_directory = os.environ.get("OLD_RULES_PROMPT_DIRECTORY", "./rules/old_rules_prompt")
+    rules_directory = settings.rules_directory
+    old_rules_directory = settings.old_rules_directory
+    rules_prompt_directory = settings.rules_prompt_directory
+    old_rules_prompt_directory = settings.old_rules_prompt_directory
     
     logger.info(f"API key: {api_key}")
     logger.info(f"Rules directory: {rules_directory}")
@@ -326,8 +288,8 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
         json_file_path = find_json_file(rules_directory, file_name)
         
         # Load the JSON data
-        with open(json_file_path, 'r') as f:
-            json_data = json.load(f)
+        with open(json_file_path, 'rb') as f:
+            json_data = orjson.loads(f.read())
         
         # Identify the rule type
         rule_type = identify_rule_type(json_data)
@@ -344,22 +306,29 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
         prompt_file_path = find_prompt_file(rules_prompt_directory, file_name)
         
         # Read the original prompt
-        with open(prompt_file_path, 'r') as f:
+        with open(prompt_file_path, 'r', encoding='utf-8') as f:
             original_prompt = f.read()
         
         # Create consolidated update prompt
         updated_prompt = create_consolidated_update_prompt(original_prompt, user_input)
         
-        # Generate new file name
-        new_file_base = generate_file_name_with_llm(updated_prompt, java_classes_map)
-        
         # Initialize the NL to JSON extractor
         logger.info("Initializing NL to JSON extractor")
         extractor = NLToJsonExtractor(api_key=api_key)
         
-        # Extract JSON schema from the updated prompt
-        logger.info("Extracting JSON schema from updated prompt")
-        new_json_data = extractor.extract_to_json(updated_prompt, rule_type, java_classes_map)
+        # Both only depend on the updated prompt, so generate the new file
+        # name in the background while the JSON schema is extracted
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            file_name_future = executor.submit(
+                generate_file_name_with_llm,
+                updated_prompt, java_classes_map, default_name="UpdatedRule"
+            )
+            
+            # Extract JSON schema from the updated prompt
+            logger.info("Extracting JSON schema from updated prompt")
+            new_json_data = extractor.extract_to_json(updated_prompt, rule_type, java_classes_map)
+            
+            new_file_base = file_name_future.result()
         
         # Update table name or rule name with the base file name
         if rule_type == "gdst":
@@ -384,8 +353,8 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
         
         # Save the new JSON file
         new_json_path = os.path.join(rules_directory, f"{new_file_base}.json")
-        with open(new_json_path, 'w') as f:
-            json.dump(new_json_data, f, indent=2)
+        with open(new_json_path, 'wb') as f:
+            f.write(orjson.dumps(new_json_data, option=orjson.OPT_INDENT_2))
         logger.info(f"Saved new JSON file to: {new_json_path}")
         
         # Move the old drools file to old_rules_directory
@@ -414,7 +383,7 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
             
         # Save the new prompt file
         new_prompt_path = os.path.join(rules_prompt_directory, f"{new_file_base}.txt")
-        with open(new_prompt_path, 'w') as f:
+        with open(new_prompt_path, 'w', encoding='utf-8') as f:
             f.write(updated_prompt)
         logger.info(f"Saved new prompt file to: {new_prompt_path}")
         
@@ -426,17 +395,14 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
         
         logger.info(f"Edit operation completed successfully for rule: {rule_name}")
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        # Get the shared OpenAI client
+        client = get_openai_client(api_key)
 
         # Reindex the updated rule (update existing point instead of creating new one)
         collection_name = "rule-master-dev"
         
         # First, find and delete the old index entry
-        qdrant_client = QdrantClient(
-            url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-            api_key=os.getenv("QDRANT_API_KEY"),
-        )
+        qdrant_client = get_qdrant_client()
         
         # Determine the old filename that should be in the index
         # Use the original file_name parameter (which could be with or without extension)
@@ -447,49 +413,19 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
         
         logger.info(f"Looking for old index entry with filename: {old_filename}")
         
-        # Search for the old rule entry
-        search_result = qdrant_client.scroll(
+        # Delete the old entry by filename in one call, accepting either rule extension
+        old_base = os.path.splitext(old_filename)[0]
+        qdrant_client.delete(
             collection_name=collection_name,
-            limit=100,
-            with_payload=True,
-            with_vectors=False
-        )
-        
-        # Find the point with matching filename
-        point_id = None
-        logger.info(f"Found {len(search_result[0])} total points in collection")
-        
-        for point in search_result[0]:
-            payload_filename = point.payload.get("filesystem_filename", "")
-            logger.info(f"Checking payload filename: {payload_filename} against: {old_filename}")
-            
-            # Try exact match first
-            if payload_filename == old_filename:
-                point_id = point.id
-                logger.info(f"Found exact matching point with ID: {point_id}")
-                break
-            
-            # Try matching without extension
-            if payload_filename and old_filename:
-                payload_base = os.path.splitext(payload_filename)[0]
-                old_base = os.path.splitext(old_filename)[0]
-                if payload_base == old_base:
-                    point_id = point.id
-                    logger.info(f"Found base name matching point with ID: {point_id}")
-                    break
-        
-        if point_id is not None:
-            # Delete the old entry
-            qdrant_client.delete(
-                collection_name=collection_name,
-                points_selector=[point_id]
+            points_selector=FilterSelector(
+                filter=filename_filter(
+                    old_filename, f"{old_base}.gdst", f"{old_base}.drl"
+                )
             )
-            logger.info(f"Deleted old index entry for: {old_filename}")
-        else:
-            logger.warning(f"No old index entry found for: {old_filename}")
-            logger.info("Available filenames in collection:")
-            for point in search_result[0]:
-                logger.info(f"  - {point.payload.get('filesystem_filename', 'NO_FILENAME')}")
+        )
+        logger.info(f"Deleted old index entry for: {old_filename}")
+        # The old entry is gone even if re-indexing below fails
+        invalidate_search_results()
         
         # Now add the new entry with updated content
         index_new_rule(
@@ -498,6 +434,7 @@ def edit_rule(user_input: str, java_classes_map: Dict[str, Dict], file_name: str
             file_path=new_drools_path,
             refined_prompt=updated_prompt
         )
+        invalidate_search_results()
         
         # Return success response
         return {
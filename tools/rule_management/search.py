@@ -4,23 +4,61 @@ Search functionality for finding similar Drools rules based on user input.
 This module provides functionality to search through rules using Qdrant vector search.
 """
 
-import os
+import time
+import asyncio
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
 from typing import List, Dict, Any
-from openai import OpenAI
-from qdrant_client import QdrantClient
+import grpc
+from openai import OpenAI, AsyncOpenAI
+from qdrant_client.http.exceptions import UnexpectedResponse
 from logger_utils import logger, log_decorator
-from dotenv import load_dotenv
+from utils.openai_client import get_openai_client, get_request_semaphore
+from utils.settings import get_settings
+from rag_setup import (
+    collection_exists,
+    get_async_qdrant_client,
+    get_qdrant_client,
+    get_search_params,
+    invalidate_collections_cache,
+    normalize_embedding_text,
+)
 
-# Load environment variables
-load_dotenv()
-
-# Get Qdrant configuration from environment
-QDRANT_URL = os.getenv("QDRANT_URL")
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = "rule-master-dev"
 
+# Payload fields read by _format_search_results. Only these are returned,
+# so Qdrant doesn't serialize and ship the full rule payload with each hit.
+SEARCH_PAYLOAD_FIELDS = ["filesystem_filename", "refined_prompt"]
+
+# Query embeddings are cached so repeated searches (e.g. search-then-delete
+# of the same rule) skip the embeddings round-trip. Entries are keyed by a
+# SHA-256 of the model and text so long inputs aren't held as dict keys.
+EMBEDDING_CACHE_SIZE = 1000
+EMBEDDING_CACHE_TTL = 300  # seconds
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+# Search responses are cached per (collection, normalized query), including
+# searches that found nothing, so search-then-delete and repeated questions
+# skip both the embedding and the Qdrant round-trip. Writes to the index call
+# invalidate_search_results(); the TTL bounds staleness from other processes.
+SEARCH_RESULT_CACHE_SIZE = 512
+SEARCH_RESULT_CACHE_TTL = 60  # seconds
+_search_result_cache = OrderedDict()
+_search_result_cache_lock = threading.Lock()
+_search_result_generation = 0
+
+# Async embedding requests arriving within this window are sent together
+EMBEDDING_BATCH_WINDOW = 0.02  # seconds
+EMBEDDING_BATCH_SIZE = 64
+# Keyed by event loop, then (id(client), model); a loop's batchers go away
+# with the loop
+_embedding_batchers = weakref.WeakKeyDictionary()
+
 def get_embedding(
-    text: str, client: OpenAI, model: str = "text-embedding-3-large"
+    text: str, client: OpenAI, model: str = None
 ) -> List[float]:
     """
     Get embedding for text using OpenAI's embedding model.
@@ -28,21 +66,348 @@ def get_embedding(
     Args:
         text (str): Text to get embedding for
         client (OpenAI): OpenAI client instance
-        model (str): OpenAI embedding model to use
+        model (str, optional): OpenAI embedding model to use, defaults to
+            the EMBEDDING_MODEL setting
 
     Returns:
         List[float]: Embedding vector
     """
-    try:
-        logger.debug(
-            f"Getting embedding for text of length {len(text)} using model {model}"
+    return get_embeddings([text], client, model)[0]
+
+def get_embeddings(
+    texts: List[str], client: OpenAI, model: str = None
+) -> List[List[float]]:
+    """
+    Get embeddings for several texts with a single embeddings request.
+
+    Texts already in the cache are served from it; the rest are sent to
+    OpenAI together in one call. Whitespace is collapsed first, the same way
+    rag_setup.embed_text does for indexed rules.
+
+    Args:
+        texts (List[str]): Texts to get embeddings for
+        client (OpenAI): OpenAI client instance
+        model (str, optional): OpenAI embedding model to use, defaults to
+            the EMBEDDING_MODEL setting
+
+    Returns:
+        List[List[float]]: Embedding vectors, in the same order as texts
+    """
+    model = model or get_settings().embedding_model
+    texts = [normalize_embedding_text(text) for text in texts]
+    embeddings, missing = _lookup_cached_embeddings(texts, model)
+    if missing:
+        try:
+            logger.debug(
+                f"Getting embeddings for {len(missing)} texts using model {model}"
+            )
+            response = client.embeddings.create(
+                input=missing,
+                model=model,
+                dimensions=get_settings().embedding_dimensions,
+            )
+            logger.debug("Successfully generated embeddings")
+        except Exception as e:
+            logger.error(f"Error generating embedding: {str(e)}")
+            raise
+        _store_embeddings(
+            embeddings, missing, [item.embedding for item in response.data], model
+        )
+    else:
+        logger.debug("Using cached embeddings")
+
+    return [embeddings[text] for text in texts]
+
+async def get_embeddings_async(
+    texts: List[str], client: AsyncOpenAI, model: str = None
+) -> List[List[float]]:
+    """
+    Async counterpart of get_embeddings, sharing the same cache.
+
+    Args:
+        texts (List[str]): Texts to get embeddings for
+        client (AsyncOpenAI): AsyncOpenAI client instance
+        model (str, optional): OpenAI embedding model to use, defaults to
+            the EMBEDDING_MODEL setting
+
+    Returns:
+        List[List[float]]: Embedding vectors, in the same order as texts
+    """
+    model = model or get_settings().embedding_model
+    texts = [normalize_embedding_text(text) for text in texts]
+    embeddings, missing = _lookup_cached_embeddings(texts, model)
+    if missing:
+        # Concurrent callers' misses are coalesced into shared requests
+        vectors = await _get_embedding_batcher(client, model).embed(missing)
+        _store_embeddings(embeddings, missing, vectors, model)
+
+    return [embeddings[text] for text in texts]
+
+class _EmbeddingBatcher:
+    """
+    Coalesce embedding requests made within a short window into one API call.
+
+    Callers on the same event loop that need embeddings at about the same
+    time (e.g. several sessions searching at once) share a single
+    embeddings request instead of sending one each.
+    """
+
+    def __init__(self, client: AsyncOpenAI, model: str):
+        self.client = client
+        self.model = model
+        self._pending = []
+        self._flush_handle = None
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Queue texts for the next batch and wait for their embeddings.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: Embedding vectors, in the same order as texts
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+
+        if len(self._pending) >= EMBEDDING_BATCH_SIZE:
+            self._schedule_flush(loop, 0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, EMBEDDING_BATCH_WINDOW)
+        return list(await asyncio.gather(*futures))
+
+    def _schedule_flush(self, loop, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(
+            delay, lambda: loop.create_task(self._flush())
+        )
+
+    async def _flush(self):
+        """Send everything queued so far as one embeddings request."""
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            logger.debug(f"Embedding batch of {len(unique_texts)} texts")
+            async with get_request_semaphore():
+                response = await self.client.embeddings.create(
+                    input=unique_texts,
+                    model=self.model,
+                    dimensions=get_settings().embedding_dimensions,
+                )
+        except Exception as e:
+            logger.error(f"Error generating embedding: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        vectors = {
+            text: item.embedding for text, item in zip(unique_texts, response.data)
+        }
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+def _get_embedding_batcher(client: AsyncOpenAI, model: str) -> _EmbeddingBatcher:
+    """
+    Return the batcher for a client and model on the running event loop.
+
+    Args:
+        client (AsyncOpenAI): AsyncOpenAI client instance
+        model (str): OpenAI embedding model
+
+    Returns:
+        _EmbeddingBatcher: Batcher shared by callers on this loop
+    """
+    loop_batchers = _embedding_batchers.setdefault(asyncio.get_running_loop(), {})
+    key = (id(client), model)
+    batcher = loop_batchers.get(key)
+    if batcher is None:
+        batcher = loop_batchers[key] = _EmbeddingBatcher(client, model)
+    return batcher
+
+def _embedding_cache_key(text: str, model: str) -> bytes:
+    """
+    Build the content-hash cache key for a normalized text.
+
+    Args:
+        text (str): Normalized text
+        model (str): OpenAI embedding model
+
+    Returns:
+        bytes: SHA-256 digest of the model and text
+    """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+def _lookup_cached_embeddings(texts: List[str], model: str):
+    """
+    Split texts into cached embeddings and the unique texts still to embed.
+
+    Args:
+        texts (List[str]): Normalized texts
+        model (str): OpenAI embedding model
+
+    Returns:
+        tuple: (dict of text -> embedding for cache hits, list of missing texts)
+    """
+    now = time.monotonic()
+    embeddings = {}
+    with _embedding_cache_lock:
+        for text in texts:
+            key = _embedding_cache_key(text, model)
+            cached = _embedding_cache.get(key)
+            if cached is not None and now - cached[0] < EMBEDDING_CACHE_TTL:
+                _embedding_cache.move_to_end(key)
+                embeddings[text] = list(cached[1])
+
+    missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+    return embeddings, missing
+
+def _store_embeddings(
+    embeddings: Dict, missing: List[str], vectors: List[List[float]], model: str
+):
+    """
+    Add freshly generated embeddings to the result dict and the cache.
+
+    Args:
+        embeddings (dict): Result dict to fill in
+        missing (List[str]): Texts that were embedded
+        vectors (List[List[float]]): Embedding vectors, in the same order as missing
+        model (str): OpenAI embedding model
+    """
+    now = time.monotonic()
+    with _embedding_cache_lock:
+        for text, vector in zip(missing, vectors):
+            key = _embedding_cache_key(text, model)
+            embeddings[text] = vector
+            _embedding_cache[key] = (now, tuple(vector))
+            _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+def _format_search_results(search_results) -> Dict[str, Any]:
+    """
+    Build the search tool response from Qdrant hits.
+
+    Args:
+        search_results: Scored points returned by Qdrant
+
+    Returns:
+        dict: Search results containing matching rules and their metadata
+    """
+    # Use the filesystem-friendly name (spaces replaced with underscores)
+    # for operations
+    formatted_results = [
+        {
+            "filesystem_filename": result.payload["filesystem_filename"].replace(" ", "_"),
+            "refined_prompt": result.payload["refined_prompt"],
+            "relevance_score": result.score
+        }
+        for result in search_results
+    ]
+
+    return {
+        "status": "success",
+        "message": f"Found {len(formatted_results)} matching rules",
+        "results": formatted_results
+    }
+
+def invalidate_search_results():
+    """
+    Drop cached search responses after rules were added, edited or deleted.
+
+    Searches already in flight won't store their (possibly stale) result.
+    """
+    global _search_result_generation
+    with _search_result_cache_lock:
+        _search_result_generation += 1
+        _search_result_cache.clear()
+
+def get_search_result_generation() -> int:
+    """
+    Return the current index generation, bumped by invalidate_search_results().
+
+    Caches built on search results store it with each entry and treat a
+    different generation as a miss.
+
+    Returns:
+        int: Current generation
+    """
+    with _search_result_cache_lock:
+        return _search_result_generation
+
+def _get_cached_search_result(query: str, collection_name: str):
+    """
+    Look up a cached search response.
+
+    Args:
+        query (str): The search query
+        collection_name (str): Name of the Qdrant collection
+
+    Returns:
+        tuple: (cache key, current generation, cached response or None)
+    """
+    key = (collection_name, normalize_embedding_text(query))
+    with _search_result_cache_lock:
+        generation = _search_result_generation
+        cached = _search_result_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < SEARCH_RESULT_CACHE_TTL:
+            _search_result_cache.move_to_end(key)
+            response = cached[1]
+        else:
+            response = None
+    if response is None:
+        return key, generation, None
+    logger.debug("Using cached search results")
+    # Callers get their own copy to modify
+    return key, generation, {
+        **response,
+        "results": [dict(result) for result in response["results"]],
+    }
+
+def _store_search_result(key, generation: int, response: Dict[str, Any]):
+    """
+    Cache a search response unless the index changed while it was fetched.
+
+    Args:
+        key: Key from _get_cached_search_result
+        generation (int): Generation from _get_cached_search_result
+        response (dict): Search response to cache
+    """
+    with _search_result_cache_lock:
+        if generation != _search_result_generation:
+            return
+        _search_result_cache[key] = (
+            time.monotonic(),
+            {**response, "results": [dict(result) for result in response["results"]]},
         )
-        response = client.embeddings.create(input=text, model=model)
-        logger.debug("Successfully generated embedding")
-        return response.data[0].embedding
-    except Exception as e:
-        logger.error(f"Error generating embedding: {str(e)}")
-        raise
+        _search_result_cache.move_to_end(key)
+        while len(_search_result_cache) > SEARCH_RESULT_CACHE_SIZE:
+            _search_result_cache.popitem(last=False)
+
+def _is_missing_collection(error: Exception) -> bool:
+    """
+    Check whether a Qdrant error means the collection doesn't exist.
+
+    Args:
+        error (Exception): Error raised by a REST or gRPC Qdrant client
+
+    Returns:
+        bool: True for a REST 404 or a gRPC NOT_FOUND
+    """
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code == 404
+    return isinstance(error, grpc.RpcError) and error.code() == grpc.StatusCode.NOT_FOUND
 
 @log_decorator("search_rules")
 def search_rules(
@@ -63,42 +428,105 @@ def search_rules(
     Returns:
         dict: Search results containing matching rules and their metadata
     """
-    # Initialize OpenAI client if not provided
+    key, generation, cached = _get_cached_search_result(query, collection_name)
+    if cached is not None:
+        return cached
+
+    # Use the shared OpenAI client if none was provided
     if client is None:
-        client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        client = get_openai_client(api_key or get_settings().openai_api_key)
 
-    # Initialize Qdrant client
-    qdrant_client = QdrantClient(
-        url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-        api_key=os.getenv("QDRANT_API_KEY"),
-    )
+    qdrant_client = get_qdrant_client()
 
     # Get the embedding for the query
     query_embedding = get_embedding(query, client)
 
-    # Search the collection
-    search_results = qdrant_client.search(
-        collection_name=collection_name,
-        query_vector=query_embedding,
-        limit=5,  # Return top 5 matches
-    )
-
-    # Format the results
-    formatted_results = []
-    for result in search_results:
-        payload = result.payload
-        filesystem_filename = payload["filesystem_filename"]
-        # Create filesystem-friendly name by replacing spaces with underscores
-        filesystem_filename = filesystem_filename.replace(" ", "_")
-        
-        formatted_results.append({
-            "filesystem_filename": filesystem_filename,  # Use filesystem name for operations
-            "refined_prompt": payload["refined_prompt"],
-            "relevance_score": result.score
-        })
+    # Search the collection. Its existence isn't checked up front; a 404
+    # (NOT_FOUND over gRPC) refreshes the cached collection list and retries
+    # once if it exists now
+    try:
+        search_results = qdrant_client.search(
+            collection_name=collection_name,
+            query_vector=query_embedding,
+            limit=5,  # Return top 5 matches
+            search_params=get_search_params(),
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=False,
+        )
+    except (UnexpectedResponse, grpc.RpcError) as e:
+        if not _is_missing_collection(e):
+            raise
+        invalidate_collections_cache()
+        if not collection_exists(qdrant_client, collection_name):
+            logger.warning(f"Collection {collection_name} does not exist")
+            search_results = []
+        else:
+            search_results = qdrant_client.search(
+                collection_name=collection_name,
+                query_vector=query_embedding,
+                limit=5,
+                search_params=get_search_params(),
+                with_payload=SEARCH_PAYLOAD_FIELDS,
+                with_vectors=False,
+            )
 
-    return {
-        "status": "success",
-        "message": f"Found {len(formatted_results)} matching rules",
-        "results": formatted_results
-    } 
\ No newline at end of file
+    response = _format_search_results(search_results)
+    _store_search_result(key, generation, response)
+    return response
+
+async def search_rules_async(
+    query: str,
+    client: AsyncOpenAI,
+    collection_name: str = COLLECTION_NAME,
+) -> Dict[str, Any]:
+    """
+    Search for rules using semantic search without blocking the event loop.
+
+    Args:
+        query (str): The search query
+        client (AsyncOpenAI): AsyncOpenAI client instance
+        collection_name (str): Name of the Qdrant collection to search in
+
+    Returns:
+        dict: Search results containing matching rules and their metadata
+    """
+    key, generation, cached = _get_cached_search_result(query, collection_name)
+    if cached is not None:
+        return cached
+
+    query_embedding = (await get_embeddings_async([query], client))[0]
+
+    # Same missing-collection handling as search_rules; the collection list
+    # is fetched with the sync client in a worker thread
+    qdrant_client = get_async_qdrant_client()
+    try:
+        search_results = await qdrant_client.search(
+            collection_name=collection_name,
+            query_vector=query_embedding,
+            limit=5,  # Return top 5 matches
+            search_params=get_search_params(),
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            with_vectors=False,
+        )
+    except (UnexpectedResponse, grpc.RpcError) as e:
+        if not _is_missing_collection(e):
+            raise
+        invalidate_collections_cache()
+        if not await asyncio.to_thread(
+            collection_exists, get_qdrant_client(), collection_name
+        ):
+            logger.warning(f"Collection {collection_name} does not exist")
+            search_results = []
+        else:
+            search_results = await qdrant_client.search(
+                collection_name=collection_name,
+                query_vector=query_embedding,
+                limit=5,
+                search_params=get_search_params(),
+                with_payload=SEARCH_PAYLOAD_FIELDS,
+                with_vectors=False,
+            )
+
+    response = _format_search_results(search_results)
+    _store_search_result(key, generation, response)
+    return response
@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import weakref
+import httpx
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    APIConnectionError,
+    APIStatusError,
+    RateLimitError,
+)
+from logger_utils import logger
+from utils.settings import get_settings
+
+
+# Transient errors (429, 5xx, timeouts, dropped connections) are retried by
+# the OpenAI SDK with jittered exponential backoff, honouring Retry-After,
+# before surfacing to the caller
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 60.0
+
+# Connection pool shared by every client built here. HTTP/2 lets concurrent
+# embedding and chat requests multiplex over one TLS connection.
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=100)
+
+# Upper bound on in-flight async OpenAI requests (chat and embeddings) per
+# event loop, so bursts queue locally instead of tripping rate limits. An
+# asyncio.Semaphore binds to the loop that first waits on it, so each loop
+# gets its own.
+MAX_CONCURRENT_REQUESTS = 32
+_request_semaphores = weakref.WeakKeyDictionary()
+
+
+def _log_retryable_response(response: httpx.Response) -> None:
+    """Log OpenAI responses that the SDK treats as transient and retries."""
+    if response.status_code == 429 or response.status_code >= 500:
+        logger.warning(
+            f"OpenAI {response.request.method} {response.request.url.path} "
+            f"returned {response.status_code} "
+            f"(retry-after={response.headers.get('retry-after')}, "
+            f"request_id={response.headers.get('x-request-id')})"
+        )
+
+
+async def _log_retryable_response_async(response: httpx.Response) -> None:
+    """Async event hook wrapper around _log_retryable_response."""
+    _log_retryable_response(response)
+
+
+@functools.lru_cache(maxsize=8)
+def get_openai_client(api_key: str) -> OpenAI:
+    """
+    Return a process-wide OpenAI client for the given API key.
+
+    Reusing one client keeps its HTTP connections alive across agents and
+    turns, so new sessions don't pay a fresh TCP/TLS handshake.
+    """
+    logger.debug("Creating shared OpenAI client")
+    return OpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        timeout=REQUEST_TIMEOUT,
+        http_client=httpx.Client(
+            http2=True,
+            limits=HTTP_LIMITS,
+            timeout=REQUEST_TIMEOUT,
+            event_hooks={"response": [_log_retryable_response]},
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Return a process-wide AsyncOpenAI client for the given API key.
+
+    The underlying connection pool belongs to the event loop that first uses
+    it, so callers should drive it from a single long-lived loop. With
+    OPENAI_USE_AIOHTTP set, requests go through aiohttp instead of httpx's
+    own transport, which holds up better under many concurrent requests.
+    """
+    event_hooks = {"response": [_log_retryable_response_async]}
+    if get_settings().openai_use_aiohttp:
+        # Needs the optional openai[aiohttp] extra, so only imported when enabled
+        from openai import DefaultAioHttpClient
+
+        logger.debug("Creating shared AsyncOpenAI client on aiohttp")
+        http_client = DefaultAioHttpClient(
+            limits=HTTP_LIMITS, timeout=REQUEST_TIMEOUT, event_hooks=event_hooks
+        )
+    else:
+        logger.debug("Creating shared AsyncOpenAI client")
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=HTTP_LIMITS,
+            timeout=REQUEST_TIMEOUT,
+            event_hooks=event_hooks,
+        )
+    return AsyncOpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        timeout=REQUEST_TIMEOUT,
+        http_client=http_client,
+    )
+
+
+def get_request_semaphore() -> asyncio.Semaphore:
+    """
+    Return the semaphore shared by async OpenAI requests on the running loop.
+
+    Returns:
+        asyncio.Semaphore: Request semaphore for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _request_semaphores.get(loop)
+    if semaphore is None:
+        # A semaphore keeps a reference to its loop, so entries for finished
+        # loops are dropped here rather than by the weak keys alone
+        for closed in [other for other in _request_semaphores if other.is_closed()]:
+            del _request_semaphores[closed]
+        semaphore = _request_semaphores[loop] = asyncio.Semaphore(
+            MAX_CONCURRENT_REQUESTS
+        )
+    return semaphore
+
+
+def log_prompt_cache_usage(response, operation: str) -> None:
+    """
+    Log how much of a completion's prompt was served from OpenAI's prompt cache.
+
+    Args:
+        response: Chat completion response
+        operation (str): Name of the calling operation, for the log line
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    logger.debug(
+        f"{operation}: {cached_tokens}/{usage.prompt_tokens} prompt tokens cached"
+    )
+
+
+def describe_openai_error(error: Exception) -> str:
+    """
+    Turn an exception raised while handling a message into a user-facing reply.
+
+    Transient failures (rate limits, server errors, timeouts, dropped
+    connections) have already been retried by the SDK, so the user is asked
+    to try again later. Other 4xx errors mean the request itself was
+    rejected and are reported as such.
+
+    Args:
+        error (Exception): Exception raised while handling the message
+
+    Returns:
+        str: Message to show the user
+    """
+    if isinstance(error, (RateLimitError, APIConnectionError)) or (
+        isinstance(error, APIStatusError) and error.status_code >= 500
+    ):
+        return (
+            "The language model service is busy or unavailable right now. "
+            "Please try again in a moment."
+        )
+    if isinstance(error, APIStatusError):
+        return f"The language model rejected the request: {error.message}"
+    return f"Error processing message: {str(error)}"
@@ -1,5 +1,6 @@
 import os
 import re
+import functools
 from typing import Dict, List
 from logger_utils import logger
 
@@ -28,34 +29,50 @@ def parse_java_classes(java_dir: str) -> Dict[str, dict]:
                 continue
             file_path = os.path.join(root, file)
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-
-                parsed_class = parse_single_java_file(content)
+                parsed_class = _parse_java_file_cached(
+                    file_path, os.stat(file_path).st_mtime
+                )
                 if parsed_class:
                     classes[parsed_class['class_name']] = {
                         "package": parsed_class['package'],
                         "class_name": parsed_class['class_name'],
-                        "methods": parsed_class['methods'],
-                        "fields": parsed_class['fields'],
+                        "methods": list(parsed_class['methods']),
+                        "fields": list(parsed_class['fields']),
                     }
                     
-                    # Debug logging for final results
-                    logger.info(f"Successfully parsed class: {parsed_class['class_name']}")
-                    logger.info(f"  Package: {parsed_class['package']}")
-                    logger.info(f"  Methods found: {len(parsed_class['methods'])}")
-                    for i, method in enumerate(parsed_class['methods'], 1):
-                        logger.info(f"    {i}. {method}")
-                    logger.info(f"  Fields found: {len(parsed_class['fields'])}")
-                    for i, field in enumerate(parsed_class['fields'], 1):
-                        logger.info(f"    {i}. {field}")
-                    logger.info("-" * 50)
-                    
             except Exception as e:
                 logger.error(f"Error parsing Java file {file_path}: {str(e)}")
                 continue
 
-    return classes
+    # os.walk order depends on the filesystem; sorting keeps every prompt
+    # built from this map byte-identical so OpenAI's prompt cache can hit
+    return dict(sorted(classes.items()))
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_java_file_cached(file_path: str, mtime: float) -> Dict:
+    """
+    Read and parse a Java file, caching the result per (path, mtime).
+
+    Callers pass the file's current mtime, so an edited file is parsed again
+    while unchanged files are served from memory.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    parsed_class = parse_single_java_file(content)
+    if parsed_class:
+        # Debug logging for final results
+        logger.info(f"Successfully parsed class: {parsed_class['class_name']}")
+        logger.info(f"  Package: {parsed_class['package']}")
+        logger.info(f"  Methods found: {len(parsed_class['methods'])}")
+        for i, method in enumerate(parsed_class['methods'], 1):
+            logger.info(f"    {i}. {method}")
+        logger.info(f"  Fields found: {len(parsed_class['fields'])}")
+        for i, field in enumerate(parsed_class['fields'], 1):
+            logger.info(f"    {i}. {field}")
+        logger.info("-" * 50)
+    return parsed_class
 
 
 def parse_single_java_file(content: str) -> Dict:
@@ -227,6 +244,7 @@ def extract_fields(content: str) -> List[str]:
     Handles various field types and modifiers.
     """
     fields = []
+    seen = set()  # O(1) duplicate checks; fields keeps declaration order
     
     # Split content into lines for more precise parsing
     lines = content.split('\n')
@@ -255,7 +273,8 @@ def extract_fields(content: str) -> List[str]:
         
         if field_match:
             field_name = field_match.group(2).strip()
-            if field_name and field_name not in fields:
+            if field_name and field_name not in seen:
+                seen.add(field_name)
                 fields.append(field_name)
             continue
         
@@ -282,7 +301,34 @@ def extract_fields(content: str) -> List[str]:
                 field_name = re.sub(r'\[.*?\]', '', field_part).strip()
                 # Remove any remaining parentheses or braces (shouldn't be in field names)
                 field_name = re.sub(r'[(){}].*', '', field_name).strip()
-                if field_name and field_name.isidentifier() and field_name not in fields:
+                if field_name and field_name.isidentifier() and field_name not in seen:
+                    seen.add(field_name)
                     fields.append(field_name)
     
-    return fields
\ No newline at end of file
+    return fields
+
+def format_java_classes(java_classes_map: Dict[str, dict], include_methods: bool = True) -> str:
+    """
+    Format a class map from parse_java_classes as a compact prompt listing.
+
+    Each class takes one line, e.g.
+    "RestaurantData (package com.myspace.x) | fields: size, sales | methods: getSize()".
+
+    Args:
+        java_classes_map (dict): Class map returned by parse_java_classes
+        include_methods (bool): Whether to list each class's methods
+
+    Returns:
+        str: One line per class
+    """
+    lines = []
+    for class_name, class_info in java_classes_map.items():
+        parts = [f"{class_name} (package {class_info.get('package', '')})"]
+        fields = class_info.get("fields", [])
+        methods = class_info.get("methods", []) if include_methods else []
+        if fields:
+            parts.append(f"fields: {', '.join(fields)}")
+        if methods:
+            parts.append(f"methods: {', '.join(methods)}")
+        lines.append(" | ".join(parts) + "\n")
+    return "".join(lines)
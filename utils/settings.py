@@ -0,0 +1,99 @@
+"""
+Application settings loaded from the environment.
+
+Environment variables (and .env) are read and validated once, on first use of
+get_settings(), instead of with os.getenv calls scattered through the code.
+"""
+
+import os
+import functools
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+
+
+def _env_bool(name: str, default: str) -> bool:
+    """Read a boolean flag from the environment."""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes")
+
+
+def _env_int(name: str, default: str) -> int:
+    """Read a positive integer from the environment."""
+    value = os.getenv(name, default)
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+    if number <= 0:
+        raise ValueError(f"{name} must be positive, got {number}")
+    return number
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Typed, read-only view of the configuration the application uses.
+    """
+
+    openai_api_key: str
+    openai_use_aiohttp: bool
+    java_dir: str
+    rules_dir: str
+    rules_directory: str
+    rules_prompt_directory: str
+    old_rules_directory: str
+    old_rules_prompt_directory: str
+    qdrant_url: str
+    qdrant_api_key: Optional[str]
+    qdrant_prefer_grpc: bool
+    qdrant_grpc_port: int
+    qdrant_search_hnsw_ef: int
+    embedding_model: str
+    embedding_dimensions: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from environment variables.
+
+        Returns:
+            Settings: Validated settings
+
+        Raises:
+            ValueError: If a numeric setting is malformed
+        """
+        return cls(
+            openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+            openai_use_aiohttp=_env_bool("OPENAI_USE_AIOHTTP", "false"),
+            java_dir=os.getenv("JAVA_DIR", ""),
+            rules_dir=os.getenv("RULES_DIR", os.path.join(os.getcwd(), "rules")),
+            rules_directory=os.getenv("RULES_DIRECTORY", "./rules/active_rules"),
+            rules_prompt_directory=os.getenv(
+                "RULES_PROMPT_DIRECTORY", "./rules/active_rules_prompt"
+            ),
+            old_rules_directory=os.getenv("OLD_RULES_DIRECTORY", "./rules/old_rules"),
+            old_rules_prompt_directory=os.getenv(
+                "OLD_RULES_PROMPT_DIRECTORY", "./rules/old_rules_prompt"
+            ),
+            qdrant_url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+            qdrant_api_key=os.getenv("QDRANT_API_KEY"),
+            qdrant_prefer_grpc=_env_bool("QDRANT_PREFER_GRPC", "true"),
+            qdrant_grpc_port=_env_int("QDRANT_GRPC_PORT", "6334"),
+            qdrant_search_hnsw_ef=_env_int("QDRANT_SEARCH_HNSW_EF", "32"),
+            embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
+            embedding_dimensions=_env_int("EMBEDDING_DIMENSIONS", "3072"),
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide settings, loading them on first use.
+
+    Call get_settings.cache_clear() to reload after changing the environment.
+
+    Returns:
+        Settings: Application settings
+    """
+    load_dotenv()
+    return Settings.from_env()